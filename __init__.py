@@ -19,7 +19,7 @@ bl_info = {
     "name": "Auto material",
     "description": "Some materials handling tools",
     "author": "Samuel Bernou",
-    "version": (0, 3, 0),
+    "version": (0, 4, 0),
     "blender": (2, 91, 0),
     "location": "Properties > Material > Settings",
     "warning": "",
@@ -32,6 +32,12 @@ from . import auto_rename
 from . import clean_slots
 from . import clean_gp_slots
 from . import ui
+from . import core
+from .core import colors, naming
+from . import fn
+from . import profiling
+from . import tracker
+from . import live_sync
 
 import bpy
 class AM_preferences(bpy.types.AddonPreferences):
@@ -42,6 +48,70 @@ class AM_preferences(bpy.types.AddonPreferences):
         description="In 'Rename all slots' mode, rename only unnamed materials (starting with 'Material')",
         default=False)
 
+    use_incremental_naming: bpy.props.BoolProperty(
+        name='Incremental Renaming',
+        description="Track material edits, renaming only process materials changed since their last renaming\n(a material renamed by hand is processed again)",
+        default=False, update=auto_rename.update_incremental_naming)
+
+    name_collision: bpy.props.EnumProperty(
+        name='Name Collision',
+        description="When a color name is already used by another material",
+        default='SUFFIX',
+        items=[(*m, i) for i, m in enumerate(naming.collision_modes)])
+
+    match_metric: bpy.props.EnumProperty(
+        name='Color Matching',
+        description="Color distance used to find the closest color name",
+        default='RGB',
+        items=[(*m, i) for i, m in enumerate(colors.metrics)])
+
+    use_live_viewport_sync: bpy.props.BoolProperty(
+        name='Live Viewport Color',
+        description="Keep material viewport color matched to node tree color while editing nodes",
+        default=False, update=live_sync.update_live_sync)
+
+    live_sync_delay: bpy.props.FloatProperty(
+        name='Delay',
+        description="Seconds without edit before viewport colors are updated (avoid updates during slider drags)",
+        default=0.3, min=0.0, max=5.0, subtype='TIME', unit='TIME')
+
+    live_sync_budget: bpy.props.IntProperty(
+        name='Time Budget (ms)',
+        description="Max time spent updating viewport colors per tick, the rest is done on next ticks",
+        default=10, min=1, max=1000)
+
+    texture_sample_mode: bpy.props.EnumProperty(
+        name='Texture Sampling',
+        description="How the color of an image texture found in node tree is sampled",
+        default='CENTER',
+        items=[(*m, i) for i, m in enumerate(fn.sample_modes)])
+
+    texture_sample_size: bpy.props.IntProperty(
+        name='Max Sample Resolution',
+        description="Bigger textures are sampled on a scaled down copy (limit memory usage)",
+        default=512, min=16, max=16384)
+
+    use_texture_cache: bpy.props.BoolProperty(
+        name='Cache Texture Colors',
+        description="Keep sampled texture colors in a file of the user config folder,\nunchanged texture files are not loaded again to find their color",
+        default=True)
+
+    use_profiling: bpy.props.BoolProperty(
+        name='Profile Operations',
+        description="Measure time spent in each stage of addon operations and print a report after each one",
+        default=False)
+
+    profile_output: bpy.props.EnumProperty(
+        name='Profile Report',
+        description="Where profiling report is written",
+        default='CONSOLE',
+        items=[(*m, i) for i, m in enumerate(profiling.outputs)])
+
+    profile_json_path: bpy.props.StringProperty(
+        name='JSON Report Path',
+        description="File where JSON profiling report is written (overwritten after each operation)",
+        default='//auto_material_profile.json', subtype='FILE_PATH')
+
     def draw(self, context):
             layout = self.layout
             # layout.use_property_split = True
@@ -49,6 +119,27 @@ class AM_preferences(bpy.types.AddonPreferences):
             # layout = flow.column()
             layout.label(text='Renaming options:')
             layout.prop(self, "only_unnamed")
+            layout.prop(self, "use_incremental_naming")
+            layout.prop(self, "match_metric")
+            layout.prop(self, "name_collision")
+            layout.label(text='Viewport color options:')
+            layout.prop(self, "use_live_viewport_sync")
+            if self.use_live_viewport_sync:
+                row = layout.row()
+                row.prop(self, "live_sync_delay")
+                row.prop(self, "live_sync_budget")
+            layout.label(text='Texture options:')
+            layout.prop(self, "texture_sample_mode")
+            layout.prop(self, "texture_sample_size")
+            row = layout.row()
+            row.prop(self, "use_texture_cache")
+            row.operator("materials.clear_texture_cache", text='', icon='TRASH')
+            layout.label(text='Debug:')
+            layout.prop(self, "use_profiling")
+            if self.use_profiling:
+                layout.prop(self, "profile_output")
+                if self.profile_output == 'JSON':
+                    layout.prop(self, "profile_json_path")
 
 
 def register():
@@ -59,8 +150,10 @@ def register():
     clean_slots.register()
     clean_gp_slots.register()
     ui.register()
+    live_sync.register()
 
 def unregister():
+    live_sync.unregister()
     ui.unregister()
     auto_rename.unregister()
     clean_gp_slots.unregister()
@@ -68,6 +161,8 @@ def unregister():
     set_color.unregister()
 
     bpy.utils.unregister_class(AM_preferences)
+    tracker.unregister()
+    core.clear_caches()
  
 if __name__ == "__main__":
     register()
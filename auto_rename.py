@@ -1,11 +1,16 @@
 from . import fn
+from . import profiling
+from . import scope
+from . import tracker
+from . import modal_runner
+from .core import naming
 import bpy
-import os
-from pathlib import Path
 
 
-def get_material_color(mat, viewport=False):
-    '''return closest color from nodes (cycle only), or viewport color'''
+def get_material_color(mat, viewport=False, resolver=None):
+    '''return closest color from nodes (cycle only), or viewport color
+    :resolver: fn.NodeColorResolver shared between materials of the same pass
+    '''
     if mat.is_grease_pencil:
         if mat.grease_pencil.show_fill:
             return mat.grease_pencil.fill_color[:]
@@ -16,41 +21,127 @@ def get_material_color(mat, viewport=False):
         return mat.diffuse_color[:]
     else:
         # later, try to get closest node from output having a color, fallback on viewport color
-        return fn.get_closest_node_color(mat)
-
-
-def rename_mat(viewport=True, self=None, color_dic=None, context=None):
-    '''If any, rename active material of active objects'''
-
-    matlist = fn.material_selection_scope()
+        return fn.get_closest_node_color(mat, resolver=resolver)
+
+
+# number of nearest palette names tried when a name is already used (name_collision 'NEAREST')
+nearest_alternatives = 8
+
+
+def apply_names(ids, names, existing):
+    '''Rename ids in two passes, names must be distinct and not in existing (see core.naming.plan_names)
+    Ids holding a name given to another id are moved to a temporary name first
+    '''
+    targets = set(names)
+    holders = [(id, name) for id, name in zip(ids, names) if id.name != name and id.name in targets]
+    used = existing | targets | {id.name for id in ids}
+    for (id, _name), tmp in zip(holders, naming.temporary_names(len(holders), used)):
+        id.name = tmp
+    for id, name in zip(ids, names):
+        if id.name != name:
+            id.name = name
+
+
+def rename_mat(viewport=True, self=None, palette=None, context=None, matlist=None, incremental=False):
+    '''If any, rename active material of active objects (see iter_rename_mat)
+    Return number of renamed materials
+    '''
+    return modal_runner.run_to_end(iter_rename_mat(viewport=viewport, self=self, palette=palette,
+                                                   context=context, matlist=matlist, incremental=incremental))
+
+
+def iter_rename_mat(viewport=True, self=None, palette=None, context=None, matlist=None, incremental=False):
+    '''If any, rename active material of active objects
+    Generator (modal_runner job): yield progress while colors are read, then rename all at once
+    :matlist: materials to rename, default to selection scope
+    :incremental: only process materials edited since their last renaming
+        (needs the 'naming' tracker channel, see use_incremental_naming addon preference)
+    Return number of renamed materials
+    '''
+
+    if matlist is None:
+        matlist = fn.material_selection_scope()
     if not matlist:
         fn.report('No material to rename', self=self, mode='ERROR')
 
     errors = []
     warnings = []
 
-    ct = 0
-    for mat in matlist:
-        col = get_material_color(mat, viewport) # get rgb color
-        colname = fn.get_color_name(col, color_dic) # get name
-        if not colname:
-            errors.append(f'Error trying to get color name from {col}')
-            continue
+    if isinstance(palette, dict):
+        from .core.palette import ColorPalette
+        palette = ColorPalette.from_dict(palette)
+    prefs = fn.get_addon_prefs()
+    metric = prefs.match_metric
+
+    channel = tracker.get('naming') if incremental else None
+    if channel is not None:
+        cache = channel.cache
+        scope_count = len(matlist)
+        # edited since last pass, never processed or renamed by user
+        matlist = [m for m in matlist
+                   if m.as_pointer() in channel.dirty
+                   or cache.get((m.as_pointer(), viewport, metric), (None, None))[1] != m.name]
+        profiling.current.count('materials_skipped', scope_count - len(matlist))
+
+    # get rgb colors, then names of all materials in one palette lookup
+    colors = {}
+    resolver = fn.NodeColorResolver.from_prefs()
+    with profiling.current.stage('color_gathering'):
+        for i, mat in enumerate(matlist):
+            yield (i, len(matlist), 'Reading colors')
+            if mat.library:
+                errors.append(f'{mat.name} is linked from a library, it cannot be renamed')
+                continue
+            col = get_material_color(mat, viewport, resolver=resolver)
+            if not col:
+                errors.append(f'Error trying to get color from {mat.name}')
+                continue
+            col = tuple(col)
+            if channel is not None:
+                # color unchanged and name still the one given last time
+                if cache.get((mat.as_pointer(), viewport, metric)) == (col, mat.name):
+                    continue
+            colors[mat] = col
+
+    colnames = fn.get_color_names(list(colors.values()), palette, metric=metric)
+
+    # resolve name collisions in memory (Blender never has to make a name unique)
+    prof = profiling.current
+    with prof.stage('name_planning'):
+        mats = list(colors.keys())
+        renamed = {m.as_pointer() for m in mats}
+        existing = {m.name for m in bpy.data.materials if m.library is None and m.as_pointer() not in renamed}
+        alternatives = None
+        if prefs.name_collision == 'NEAREST':
+            cols = list(colors.values())
+            alternatives = lambda i: palette.ranked_names(cols[i], nearest_alternatives, metric=metric)[1:]
+        final_names = naming.plan_names([m.name for m in mats], colnames, existing, alternatives=alternatives)
+
+    # apply
+    if channel is not None:
+        for mat in matlist:
+            channel.discard(mat)
 
-        if colname == mat.name:  # check if already named
-            warnings.append(f'Material "{mat.name}" already named')
-            continue
-
-        # check if already exist
-        if bpy.data.materials.get(colname):
-            warnings.append(f'"{mat.name}" -> "{colname}" but already existed')
-
-        print(f'"{mat.name}" -> "{colname}"')
-        mat.name = colname
-        ct += 1
+    ct = 0
+    with prof.stage('renaming'):
+        for mat, colname, name in zip(mats, colnames, final_names):
+            if name == mat.name:  # check if already named
+                if channel is None:
+                    warnings.append(f'Material "{mat.name}" already named')
+            else:
+                if name != colname:
+                    warnings.append(f'"{mat.name}" -> "{name}" ("{colname}" already used)')
+                print(f'"{mat.name}" -> "{name}"')
+                ct += 1
+        apply_names(mats, final_names, existing)
+
+        if channel is not None:
+            for mat, col in colors.items():
+                cache[(mat.as_pointer(), viewport, metric)] = (col, mat.name)
+    prof.count('materials_renamed', ct)
 
     if warnings:
-        fn.report(f"Auto material {len(warnings)} warnings--\n" + '\n'.join(errors), self=self, mode='WARNING')
+        fn.report(f"Auto material {len(warnings)} warnings--\n" + '\n'.join(warnings), self=self, mode='WARNING')
 
     if errors:
         fn.report(f"Auto material {len(errors)} errors--\n" + '\n'.join(errors), self=self, mode='ERROR')
@@ -59,22 +150,31 @@ def rename_mat(viewport=True, self=None, color_dic=None, context=None):
         fn.report(f'{ct} Materials renamed', self=self)
     else:
         print(f'{ct} Materials renamed')
+    return ct
 
 
 
-class AM_OT_auto_name_material(bpy.types.Operator):
+class AM_OT_auto_name_material(modal_runner.ModalJob, bpy.types.Operator):
     bl_idname = "materials.auto_name_material"
     bl_label = "Auto name material"
     bl_description = "rename material according to color"
-    bl_options = {"REGISTER"}
+    bl_options = {"REGISTER", "UNDO"}
 
     viewport: bpy.props.BoolProperty()
 
     def execute(self, context):
-        db = Path(os.path.realpath(__file__)).parent / 'colornames.json'
-        color_dic = fn.load_color_dic(db)
-        rename_mat(viewport=self.viewport, self=self,
-                   color_dic=color_dic, context=context)
+        return self.run_job(context)
+
+    def job(self, context):
+        with profiling.current.stage('palette_loading'):
+            palette = fn.load_color_dic()
+        return iter_rename_mat(viewport=self.viewport, self=self,
+                               palette=palette, context=context,
+                               matlist=fn.material_selection_scope(context),
+                               incremental=fn.get_addon_prefs().use_incremental_naming)
+
+    def job_finished(self, context, result):
+        # rename_mat report by itself
         return {"FINISHED"}
 
 
@@ -96,8 +196,7 @@ class AM_OT_convert_clipboard_color_to_name(bpy.types.Operator):
                       self=self, mode='ERROR')
             return {"CANCELLED"}
 
-        db = Path(os.path.realpath(__file__)).parent / 'colornames.json'
-        color_dic = fn.load_color_dic(db)
+        palette = fn.load_color_dic()
 
         if reclip:
             # try to safely eval string to get tuple/list
@@ -110,7 +209,7 @@ class AM_OT_convert_clipboard_color_to_name(bpy.types.Operator):
                 return {"CANCELLED"}
 
         # send rgb as tuple or hex as str
-        newclip = fn.get_color_name(clip, color_dic)
+        newclip = fn.get_color_name(clip, palette)
 
         if not newclip:
             fn.report('Could not get color name', self=self, mode='ERROR')
@@ -133,12 +232,31 @@ def register():
         name="Affect All Slots", default=True,
         description="Affect all material slots (skip already named materials if option is active in addon prefs)\nelse only active slot", options={'HIDDEN'})
 
+    bpy.types.Scene.mat_scope = bpy.props.EnumProperty(
+        name="Scope", default='SELECTED',
+        description="Objects whose materials are affected by renaming and color operators",
+        items=scope.enum_items(), options={'HIDDEN'})
+
     for cls in classes:
         bpy.utils.register_class(cls)
 
+    if fn.get_addon_prefs().use_incremental_naming:
+        tracker.subscribe('naming')
+
+
+def update_incremental_naming(self, context):
+    '''AM_preferences.use_incremental_naming update'''
+    if self.use_incremental_naming:
+        tracker.subscribe('naming')
+    else:
+        tracker.unsubscribe('naming')
+
 
 def unregister():
+    tracker.unsubscribe('naming')
+
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
 
+    del bpy.types.Scene.mat_scope
     del bpy.types.Scene.mat_change_multiple
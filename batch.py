@@ -0,0 +1,207 @@
+'''Clean and rename materials of every .blend files in a directory tree, headless.
+
+Run from a regular python (not Blender):
+    python batch.py /path/to/blends --blender /path/to/blender [--jobs 8] [--dry-run] [--report summary.json]
+
+Each file is processed by a separate background Blender process (`blender -b`),
+as many in parallel as --jobs (default: number of cores).
+Every worker write a JSON report for its file, merged in a summary by the parent.
+
+Operations (all enabled by default):
+- replace incremental material duplications (.001, .002) everywhere in file
+- clean grease pencil material stacks (duplications, slot fusion, empty slots)
+- auto rename materials from their color (--rename viewport|nodes|none)
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+ADDON_DIR = Path(__file__).resolve().parent
+
+
+## --- Worker (run inside Blender)
+
+def import_addon():
+    '''Enable addon from its folder, return package module'''
+    import importlib
+    import addon_utils
+    sys.path.insert(0, str(ADDON_DIR.parent))
+    addon_utils.enable(ADDON_DIR.name, default_set=True)
+    return importlib.import_module(ADDON_DIR.name)
+
+
+def process_file(args):
+    '''Run requested operations on the currently opened file, return report dict'''
+    import bpy
+    addon = import_addon()
+    clean_slots = addon.clean_slots
+    clean_gp_slots = addon.clean_gp_slots
+    auto_rename = addon.auto_rename
+    fn = addon.fn
+
+    report = {
+        'file': bpy.data.filepath,
+        'materials_before': len(bpy.data.materials),
+        'duplications_replaced': 0,
+        'gp_objects_cleaned': 0,
+        'gp_slots_removed': 0,
+        'renamed': 0,
+        'messages': [],
+    }
+
+    if args.dedup:
+        report['duplications_replaced'] = clean_slots.replace_increment_duplication(
+            targets='FILE', similar_check=not args.no_similar_check, force_delete=True)
+
+    if args.gp:
+        for ob in bpy.data.objects:
+            if ob.type != 'GPENCIL' or ob.library or ob.data.library:
+                continue
+            # operator fallback (object-linked slots) need object in view layer
+            if ob.name not in bpy.context.view_layer.objects:
+                continue
+            slots = len(ob.material_slots)
+            info = clean_gp_slots.clean_gp_material_stack(ob)
+            if info:
+                report['messages'].append(f'{ob.name}: {info[1]}')
+            report['gp_objects_cleaned'] += 1
+            report['gp_slots_removed'] += slots - len(ob.material_slots)
+
+    if args.rename != 'none':
+        matlist = [m for m in bpy.data.materials if not m.library]
+        report['renamed'] = auto_rename.rename_mat(viewport=args.rename == 'viewport',
+                                                   palette=fn.load_color_dic(), matlist=matlist)
+
+    report['materials_after'] = len(bpy.data.materials)
+
+    if not args.dry_run:
+        bpy.ops.wm.save_mainfile()
+    report['saved'] = not args.dry_run
+    return report
+
+
+def worker_main(argv):
+    parser = argparse.ArgumentParser()
+    add_operation_args(parser)
+    parser.add_argument('--worker-report', required=True)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    report = process_file(args)
+    report['seconds'] = time.perf_counter() - start
+    with open(args.worker_report, 'w') as fd:
+        json.dump(report, fd, indent=2)
+
+
+## --- Parent
+
+def add_operation_args(parser):
+    parser.add_argument('--dry-run', action='store_true', help='Process files but do not save them')
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false', help='Skip duplications replacement')
+    parser.add_argument('--no-similar-check', action='store_true', help='Replace duplications even if their settings/node_tree differ')
+    parser.add_argument('--no-gp', dest='gp', action='store_false', help='Skip grease pencil material stack cleaning')
+    parser.add_argument('--rename', choices=('viewport', 'nodes', 'none'), default='nodes', help='Auto rename source color (default: nodes)')
+
+
+def operation_argv(args):
+    argv = []
+    if args.dry_run:
+        argv.append('--dry-run')
+    if not args.dedup:
+        argv.append('--no-dedup')
+    if args.no_similar_check:
+        argv.append('--no-similar-check')
+    if not args.gp:
+        argv.append('--no-gp')
+    argv += ['--rename', args.rename]
+    return argv
+
+
+def run_worker(blender, blend, report_fp, argv, timeout):
+    cmd = [blender, '-b', str(blend), '--factory-startup', '--python-exit-code', '1',
+           '--python', str(Path(__file__).resolve()),
+           '--', '--worker', '--worker-report', str(report_fp)] + argv
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+        output, returncode = proc.stdout, proc.returncode
+    except subprocess.TimeoutExpired as e:
+        output, returncode = e.stdout or '', 'timeout'
+
+    if returncode == 0 and report_fp.exists():
+        with report_fp.open() as fd:
+            return json.load(fd)
+    return {
+        'file': str(blend),
+        'error': f'worker failed ({returncode})',
+        'output': (output if isinstance(output, str) else output.decode(errors='replace'))[-2000:],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def merge_reports(reports):
+    keys = ('duplications_replaced', 'gp_objects_cleaned', 'gp_slots_removed', 'renamed')
+    summary = {
+        'files': len(reports),
+        'failed': [r['file'] for r in reports if 'error' in r],
+        'materials_removed': sum(r['materials_before'] - r['materials_after'] for r in reports if 'error' not in r),
+    }
+    for key in keys:
+        summary[key] = sum(r.get(key, 0) for r in reports)
+    summary['worker_seconds'] = sum(r.get('seconds', 0) for r in reports)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', type=Path, help='Folder scanned recursively for .blend files')
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help='Blender executable (default: $BLENDER or blender)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Number of parallel Blender processes')
+    parser.add_argument('--timeout', type=float, default=None, help='Max seconds per file')
+    parser.add_argument('--report', type=Path, help='Write merged JSON report (summary and per file reports)')
+    add_operation_args(parser)
+    args = parser.parse_args(argv)
+
+    blends = sorted(args.directory.rglob('*.blend'))
+    if not blends:
+        print(f'No .blend file found in {args.directory}')
+        return 1
+
+    argv = operation_argv(args)
+    reports = []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        # threads only wait for blender processes
+        futures = {pool.submit(run_worker, args.blender, blend, Path(tmp) / f'{i}.json', argv, args.timeout): blend
+                   for i, blend in enumerate(blends)}
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            status = report.get('error') or f"{report['duplications_replaced']} replaced, {report['renamed']} renamed"
+            print(f'[{len(reports)}/{len(blends)}] {futures[future]}: {status}')
+
+    summary = merge_reports(reports)
+    summary['wall_seconds'] = time.perf_counter() - start
+    print(json.dumps(summary, indent=2))
+
+    if args.report:
+        with args.report.open('w') as fd:
+            json.dump({'summary': summary, 'files': sorted(reports, key=lambda r: r['file'])}, fd, indent=2)
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    if '--worker' in sys.argv:
+        argv = sys.argv[sys.argv.index('--') + 1:]
+        argv.remove('--worker')
+        worker_main(argv)
+    else:
+        sys.exit(main())
@@ -0,0 +1,104 @@
+'''Benchmark bpy-free core computations, serial against process pool.
+
+Run with a regular python having numpy (no Blender needed):
+    python benchmarks/bench_core.py [--colors 20000] [--records 20000] [--workers 4] [--texture-size 512]
+
+Color naming uses the addon colornames.json database, signature hashing
+uses synthetic records shaped like material node trees.
+Dominant color runs on a noisy buffer of the max sample resolution
+(bigger textures are scaled down to it before sampling).
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from core import palette, parallel, sampling
+
+
+def synthetic_record(rnd, nodes=30):
+    '''Nested tuples of plain values, roughly the shape of a material record'''
+    return (
+        (('diffuse_color', tuple(rnd.random() for _ in range(4))), ('blend_method', 'OPAQUE'), ('roughness', rnd.random())),
+        tuple((
+            'ShaderNodeMixRGB', None,
+            (('blend_type', 'MIX'), ('use_clamp', False)),
+            (('Fac', False, rnd.random()), ('Color1', True, (('Color', i + 1),)), ('Color2', False, (rnd.random(), rnd.random(), rnd.random(), 1.0))),
+        ) for i in range(nodes)),
+    )
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def check_compiled(pal):
+    '''Write palette in compiled format, read it back through the memory-mapped path and time both loads'''
+    import tempfile
+    with tempfile.TemporaryDirectory(prefix='automat_palette_') as tmp:
+        compiled = Path(tmp) / f'colornames{palette.COMPILED_SUFFIX}'
+        palette.write_compiled(compiled, pal)
+        loaded, t_read = timed(palette.read_compiled, compiled)
+        assert isinstance(loaded.colors, np.memmap), 'compiled palette is not memory-mapped'
+        assert loaded.names == pal.names and np.array_equal(loaded.colors, pal.colors)
+
+        source = Path(tmp) / 'colornames.json'
+        source.write_text('{}')
+        parsed = []
+        fallback = lambda fp: parsed.append(fp) or pal
+        palette.load_compiled_or_json(source, fallback)
+        palette.load_compiled_or_json(source, fallback)
+        assert len(parsed) == 1, 'json parsed while compiled palette is up to date'
+
+        # database swapped with an older modification time than the compiled file
+        source.write_text('{ }')
+        os.utime(source, ns=(0, 0))
+        palette.load_compiled_or_json(source, fallback)
+        assert len(parsed) == 2, 'outdated compiled palette used'
+        del loaded
+    print(f'compiled palette: read in {t_read * 1000:.2f}ms (memory-mapped)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--colors', type=int, default=20000)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=0, help='0 for cpu count')
+    parser.add_argument('--texture-size', type=int, default=512, help='Sampled texture resolution')
+    parser.add_argument('--metrics', nargs='+', default=[m[0] for m in palette.ColorPalette.metrics])
+    args = parser.parse_args()
+
+    workers = parallel.get_workers(args.workers)
+    pal, load = timed(palette.load_file, Path(__file__).resolve().parents[1] / 'colornames.json')
+    print(f'palette: {len(pal)} colors loaded in {load * 1000:.1f}ms, {workers} workers')
+    check_compiled(pal)
+
+    colors = np.random.default_rng(0).random((args.colors, 3))
+    for metric in args.metrics:
+        serial, t_serial = timed(parallel.nearest, pal, colors, metric=metric, workers=1)
+        pooled, t_pool = timed(parallel.nearest, pal, colors, metric=metric, workers=workers)
+        assert serial == pooled
+        print(f'naming {metric:<10} {args.colors} colors: serial {t_serial:.3f}s, pool {t_pool:.3f}s')
+
+    rnd = random.Random(0)
+    records = [synthetic_record(rnd) for _ in range(args.records)]
+    serial, t_serial = timed(parallel.signature_hashes, records, workers=1)
+    pooled, t_pool = timed(parallel.signature_hashes, records, workers=workers)
+    assert serial == pooled
+    print(f'hashing {args.records} records: serial {t_serial:.3f}s, pool {t_pool:.3f}s')
+
+    pixels = np.random.default_rng(0).random((args.texture_size, args.texture_size, 4), dtype=np.float32)
+    times = [timed(sampling.dominant_color, pixels)[1] for _ in range(5)]
+    print(f'dominant color {args.texture_size}px texture: median {sorted(times)[2] * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+'''Benchmark nearest color name lookup against palette size.
+
+Run with a regular python having numpy (no Blender needed):
+    python benchmarks/bench_palette.py [--queries 500] [--sizes 1000 10000 100000]
+
+Per query cost of LAB and CIEDE2000 metrics should stay roughly flat
+when the palette grows, since only a few grid cells are visited.
+'''
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from core import palette
+
+
+def bench(size, queries, metrics, seed=0):
+    rng = np.random.default_rng(seed)
+    pal = palette.ColorPalette([f'color {i}' for i in range(size)], rng.random((size, 3)))
+    colors = rng.random((queries, 3))
+
+    # build index outside of timing (done once per session in the addon)
+    start = time.perf_counter()
+    pal.grid
+    build = time.perf_counter() - start
+
+    row = {'size': size, 'index_build_ms': build * 1000}
+    for metric in metrics:
+        start = time.perf_counter()
+        pal.nearest_indices(colors, metric=metric)
+        row[metric] = (time.perf_counter() - start) / queries * 1e6
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--metrics', nargs='+', default=[m[0] for m in palette.ColorPalette.metrics])
+    args = parser.parse_args()
+
+    print(f"{'palette':>10} {'index build':>12}" + ''.join(f'{m + " us/query":>20}' for m in args.metrics))
+    for size in args.sizes:
+        row = bench(size, args.queries, args.metrics)
+        print(f"{row['size']:>10} {row['index_build_ms']:>10.1f}ms" + ''.join(f'{row[m]:>20.1f}' for m in args.metrics))
+
+
+if __name__ == '__main__':
+    main()
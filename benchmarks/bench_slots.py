@@ -0,0 +1,77 @@
+'''Benchmark batch empty material slots removal.
+
+Run in background Blender:
+    blender -b --factory-startup --python benchmarks/bench_slots.py -- [--objects 10000] [--ops-sample 200]
+
+Create N mesh objects with empty slots interleaved with material slots,
+time material_slots.remove_empty_slots on all of them, then time the previous
+per slot bpy.ops.object.material_slot_remove approach on a sample
+(extrapolated, a full run on 10k objects takes too long).
+'''
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import bpy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import blender_utils
+
+material_slots = blender_utils.import_addon_module('material_slots')
+
+
+def build_scene(count, slots=6, shared_every=10):
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    mats = [bpy.data.materials.new(f'bench_mat_{i}') for i in range(slots)]
+    objects = []
+    mesh = None
+    for i in range(count):
+        if i % shared_every == 0:
+            mesh = bpy.data.meshes.new(f'bench_mesh_{i}')
+            mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [], [(0, 1, 2, 3)])
+            for j in range(slots):
+                # one slot out of two is empty
+                mesh.materials.append(mats[j] if j % 2 else None)
+        ob = bpy.data.objects.new(f'bench_ob_{i}', mesh)
+        bpy.context.scene.collection.objects.link(ob)
+        objects.append(ob)
+    return objects
+
+
+def ops_remove_empty(ob):
+    '''Previous approach: one operator call per empty slot on active object'''
+    bpy.context.view_layer.objects.active = ob
+    for i in range(len(ob.material_slots))[::-1]:
+        if not ob.material_slots[i].material:
+            ob.active_material_index = i
+            bpy.ops.object.material_slot_remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=10000)
+    parser.add_argument('--ops-sample', type=int, default=200)
+    args = parser.parse_args(blender_utils.script_args())
+
+    objects = build_scene(args.objects)
+    start = time.perf_counter()
+    removed, skipped = material_slots.remove_empty_slots(objects)
+    bpy.context.view_layer.update()
+    batch = time.perf_counter() - start
+    print(f'batch: {len(objects)} objects, {removed} slots removed, {len(skipped)} skipped in {batch:.3f}s')
+
+    # unique meshes for the operator sample, so each object really has slots to remove
+    objects = build_scene(args.ops_sample, shared_every=1)
+    start = time.perf_counter()
+    for ob in objects:
+        ops_remove_empty(ob)
+    bpy.context.view_layer.update()
+    ops = time.perf_counter() - start
+    print(f'bpy.ops: {len(objects)} objects in {ops:.3f}s '
+          f'(~{ops / len(objects) * args.objects:.1f}s extrapolated for {args.objects} objects)')
+
+
+if __name__ == '__main__':
+    main()
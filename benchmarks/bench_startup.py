@@ -0,0 +1,103 @@
+'''Measure addon enable time at Blender startup and check it stays under a target.
+
+Run with a regular python (Blender is started in background for each run,
+so every measure is a cold import):
+    python benchmarks/bench_startup.py --blender /path/to/blender [--repeat 5] [--target-ms 50] [--output startup.json]
+
+Each run reports the time spent in addon_utils.enable and the heavy modules
+(numpy, palette matching, slots batch functions) that were imported by the
+enable itself: none should be, they are loaded on first use.
+Exit with code 1 if the median enable time exceeds target or a heavy module is loaded.
+'''
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ADDON_DIR = Path(__file__).resolve().parents[1]
+
+# modules that must not be imported by addon registration
+HEAVY_MODULES = ('numpy', 'core.palette', 'core.parallel', 'core.sampling', 'material_slots')
+
+
+## --- Worker (run inside Blender)
+
+def measure():
+    '''Enable addon once, return dict with enable time and heavy modules it imported'''
+    import addon_utils
+    sys.path.insert(0, str(ADDON_DIR.parent))
+    before = set(sys.modules)
+    start = time.perf_counter()
+    addon_utils.enable(ADDON_DIR.name, default_set=True)
+    elapsed = time.perf_counter() - start
+    loaded = set(sys.modules) - before
+    heavy = [name for name in HEAVY_MODULES if name in loaded or f'{ADDON_DIR.name}.{name}' in loaded]
+    return {
+        'enable_ms': elapsed * 1000,
+        'heavy_modules': heavy,
+        'addon_modules': sorted(m for m in loaded if m.split('.')[0] == ADDON_DIR.name),
+    }
+
+
+def worker_main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worker-report', required=True)
+    args = parser.parse_args(argv)
+    with open(args.worker_report, 'w') as fd:
+        json.dump(measure(), fd)
+
+
+## --- Driver
+
+def run_once(blender, report):
+    cmd = [blender, '-b', '--factory-startup', '--python-exit-code', '1',
+           '--python', __file__, '--', '--worker-report', str(report)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(report) as fd:
+        return json.load(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blender', default='blender', help='Blender executable')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=50.0, help='Max median enable time')
+    parser.add_argument('--output', type=Path, help='Write runs as JSON')
+    args = parser.parse_args()
+
+    import tempfile
+    runs = []
+    with tempfile.TemporaryDirectory(prefix='automat_startup_') as tmp:
+        for i in range(max(1, args.repeat)):
+            run = run_once(args.blender, Path(tmp) / f'run_{i}.json')
+            print(f"run {i}: {run['enable_ms']:.1f}ms")
+            runs.append(run)
+
+    median = statistics.median(r['enable_ms'] for r in runs)
+    heavy = sorted({m for r in runs for m in r['heavy_modules']})
+    print(f'median enable time: {median:.1f}ms (target {args.target_ms:.1f}ms)')
+
+    if args.output:
+        with args.output.open('w') as fd:
+            json.dump({'median_ms': median, 'target_ms': args.target_ms, 'runs': runs}, fd, indent=2)
+
+    failed = False
+    if heavy:
+        print(f'! Heavy modules imported at registration: {", ".join(heavy)}')
+        failed = True
+    if median > args.target_ms:
+        print(f'! Enable time {median:.1f}ms > {args.target_ms:.1f}ms')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if '--' in sys.argv:
+        worker_main(sys.argv[sys.argv.index('--') + 1:])
+    else:
+        main()
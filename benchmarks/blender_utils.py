@@ -0,0 +1,28 @@
+'''Helpers shared by benchmarks running inside background Blender'''
+
+import importlib
+import sys
+from pathlib import Path
+
+ADDON_DIR = Path(__file__).resolve().parents[1]
+
+
+def script_args():
+    '''Return command line arguments passed after "--" to blender'''
+    return sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+
+def import_addon_module(name=None):
+    '''Import addon package (or one of its modules) without enabling it'''
+    if str(ADDON_DIR.parent) not in sys.path:
+        sys.path.insert(0, str(ADDON_DIR.parent))
+    return importlib.import_module(f'{ADDON_DIR.name}.{name}' if name else ADDON_DIR.name)
+
+
+def enable_addon():
+    '''Enable addon (registered operators and preferences), return package module'''
+    import addon_utils
+    if str(ADDON_DIR.parent) not in sys.path:
+        sys.path.insert(0, str(ADDON_DIR.parent))
+    addon_utils.enable(ADDON_DIR.name, default_set=True)
+    return importlib.import_module(ADDON_DIR.name)
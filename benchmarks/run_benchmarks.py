@@ -0,0 +1,144 @@
+'''Time addon hot paths on synthetic scenes.
+
+Run in background Blender (CPU only is fine):
+    blender -b --factory-startup --python benchmarks/run_benchmarks.py -- \
+        [--preset small|medium|large] [--output results.json] [--baseline previous.json] [--max-ratio 1.25]
+
+A fresh scene is generated for each benchmark (see scene_generator.py, every
+setting can be overridden, e.g. --materials 5000). Results are written to JSON
+with the addon version and config. When a baseline result file is passed,
+each timing is compared to it and the script exits with code 1 if one is
+slower than baseline * max-ratio (only meaningful with same preset/config).
+Absolute limits can also be given with --thresholds (JSON {"benchmark": seconds}).
+'''
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bpy
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import blender_utils
+import scene_generator
+
+
+def bench_rename_from_nodes(addon, data):
+    addon.auto_rename.rename_mat(viewport=False, palette=addon.fn.load_color_dic())
+
+def bench_rename_from_viewport(addon, data):
+    addon.auto_rename.rename_mat(viewport=True, palette=addon.fn.load_color_dic())
+
+def bench_viewport_from_node(addon, data):
+    addon.fn.match_color_viewport_from_node()
+
+def bench_node_from_viewport(addon, data):
+    addon.fn.match_color_node_from_viewport()
+
+def bench_replace_duplication_scene(addon, data):
+    addon.clean_slots.replace_increment_duplication(targets='SCENE', similar_check=True)
+
+def bench_replace_duplication_file(addon, data):
+    addon.clean_slots.replace_increment_duplication(targets='FILE', similar_check=True)
+
+def bench_material_scope_selected(addon, data):
+    addon.scope.get_materials('SELECTED')
+
+def bench_material_scope_scene(addon, data):
+    addon.scope.get_materials('SCENE')
+
+def bench_gp_stack_clean(addon, data):
+    for ob in data['gp_objects']:
+        addon.clean_gp_slots.clean_gp_material_stack(ob)
+
+
+BENCHMARKS = {
+    'rename_from_nodes': bench_rename_from_nodes,
+    'rename_from_viewport': bench_rename_from_viewport,
+    'viewport_color_from_node': bench_viewport_from_node,
+    'node_color_from_viewport': bench_node_from_viewport,
+    'replace_duplication_scene': bench_replace_duplication_scene,
+    'replace_duplication_file': bench_replace_duplication_file,
+    'gp_stack_clean': bench_gp_stack_clean,
+    'material_scope_selected': bench_material_scope_selected,
+    'material_scope_scene': bench_material_scope_scene,
+}
+
+
+def compare(results, reference, max_ratio=1.0):
+    '''Return list of (benchmark, seconds, limit) exceeding reference * max_ratio'''
+    failures = []
+    for name, seconds in results.items():
+        limit = reference.get(name)
+        if limit is not None and seconds > limit * max_ratio:
+            failures.append((name, seconds, limit * max_ratio))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=scene_generator.PRESETS.keys(), default='medium')
+    for key, value in scene_generator.DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=type(value), default=None)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS.keys(), help='Run only these benchmarks')
+    parser.add_argument('--repeat', type=int, default=1, help='Keep best time of N runs (scene regenerated each time)')
+    parser.add_argument('--output', type=Path, help='Write results as JSON')
+    parser.add_argument('--baseline', type=Path, help='Previous results JSON to compare with')
+    parser.add_argument('--max-ratio', type=float, default=1.25, help='Allowed slowdown against baseline')
+    parser.add_argument('--thresholds', type=Path, help='JSON of absolute max seconds per benchmark')
+    args = parser.parse_args(blender_utils.script_args())
+
+    overrides = {k: getattr(args, k) for k in scene_generator.DEFAULT_CONFIG}
+    config = scene_generator.get_config(args.preset, **overrides)
+    addon = blender_utils.enable_addon()
+    # textures must be sampled on each run (and temporary files kept out of the user cache)
+    addon.fn.get_addon_prefs().use_texture_cache = False
+
+    results = {}
+    # textures are written once per run and deleted at the end
+    with tempfile.TemporaryDirectory(prefix='automat_bench_') as image_folder:
+        for name in args.only or BENCHMARKS:
+            best = None
+            for _ in range(max(1, args.repeat)):
+                data = scene_generator.generate(config, image_folder)
+                start = time.perf_counter()
+                BENCHMARKS[name](addon, data)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            print(f'{name:<28} {best:>10.4f}s')
+        scene_generator.reset() # release loaded images before deleting their files
+
+    output = {
+        'addon_version': list(addon.bl_info['version']),
+        'blender_version': list(bpy.app.version),
+        'preset': args.preset,
+        'config': config,
+        'results': results,
+    }
+    if args.output:
+        with args.output.open('w') as fd:
+            json.dump(output, fd, indent=2)
+
+    failures = []
+    if args.baseline:
+        with args.baseline.open() as fd:
+            baseline = json.load(fd)
+        if baseline.get('config') != config:
+            print('! Baseline was generated with a different config, comparison is not meaningful')
+        failures += compare(results, baseline['results'], args.max_ratio)
+    if args.thresholds:
+        with args.thresholds.open() as fd:
+            failures += compare(results, json.load(fd))
+
+    for name, seconds, limit in failures:
+        print(f'! {name}: {seconds:.4f}s > {limit:.4f}s')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
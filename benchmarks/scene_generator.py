@@ -0,0 +1,176 @@
+'''Synthetic scenes for benchmarks (run inside Blender)
+
+Everything is generated from a seed, so two runs with the same config build the same scene.
+'''
+
+import random
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+
+DEFAULT_CONFIG = {
+    'materials': 1000, # unique materials
+    'duplicate_ratio': 0.5, # number of .00N clones per unique material
+    'tree_depth': 8, # levels of the diamond shaped node graph above the shader
+    'images': 4, # image textures shared between materials
+    'image_size': 2048,
+    'objects': 1000, # mesh objects, slots spread over materials and clones
+    'slots_per_object': 4,
+    'gp_objects': 4,
+    'gp_frames': 200,
+    'gp_strokes': 50, # per frame
+    'gp_slots': 12, # per gp object (with duplications)
+    'seed': 0,
+}
+
+PRESETS = {
+    'small': {'materials': 200, 'objects': 200, 'images': 2, 'image_size': 512, 'gp_frames': 50, 'tree_depth': 6},
+    'medium': {},
+    'large': {'materials': 5000, 'objects': 20000, 'images': 8, 'image_size': 8192, 'gp_objects': 10, 'gp_frames': 1000, 'tree_depth': 10},
+}
+
+
+def get_config(preset='medium', **overrides):
+    config = dict(DEFAULT_CONFIG)
+    config.update(PRESETS[preset])
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    return config
+
+
+def reset():
+    '''Remove generated data (factory settings reload would disable the addon)'''
+    bpy.data.batch_remove([*bpy.data.objects, *bpy.data.meshes, *bpy.data.grease_pencils,
+                           *bpy.data.materials, *bpy.data.images, *bpy.data.node_groups])
+
+
+def new_image(name, size, rng, folder):
+    '''Create a random image texture saved on disk (image type must be IMAGE, not generated)
+    An image already written in folder by a previous generation is loaded again
+    (same name, size and seed give the same pixels)
+    '''
+    fp = Path(folder) / f'{name}_{size}.png'
+    if fp.exists():
+        return bpy.data.images.load(str(fp))
+    img = bpy.data.images.new(name, size, size)
+    pixels = rng.random(size * size * 4, dtype=np.float32)
+    img.pixels.foreach_set(pixels)
+    img.filepath_raw = str(fp)
+    img.file_format = 'PNG'
+    img.save()
+    bpy.data.images.remove(img)
+    return bpy.data.images.load(str(fp))
+
+
+def build_node_tree(mat, depth, rnd, image=None):
+    '''Diamond shaped graph: each mix node takes both nodes of the level above
+    (2 nodes per level, paths count double at each level)
+    '''
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+    links = mat.node_tree.links
+    bsdf = nodes.get('Principled BSDF')
+
+    if image:
+        top = nodes.new('ShaderNodeTexImage')
+        top.image = image
+    else:
+        top = nodes.new('ShaderNodeRGB')
+        top.outputs[0].default_value = (rnd.random(), rnd.random(), rnd.random(), 1.0)
+
+    level = [top, top]
+    for _ in range(depth):
+        new_level = []
+        for _ in range(2):
+            mix = nodes.new('ShaderNodeMixRGB')
+            links.new(level[0].outputs[0], mix.inputs['Color1'])
+            links.new(level[1].outputs[0], mix.inputs['Color2'])
+            new_level.append(mix)
+        level = new_level
+    links.new(level[0].outputs[0], bsdf.inputs['Base Color'])
+
+
+def build_materials(config, rnd, images):
+    '''Create unique materials and their .00N clones, return list of all materials'''
+    materials = []
+    for i in range(config['materials']):
+        mat = bpy.data.materials.new(f'Material bench {i}')
+        mat.diffuse_color = (rnd.random(), rnd.random(), rnd.random(), 1.0)
+        image = images[i % len(images)] if images and i % 3 == 0 else None
+        build_node_tree(mat, config['tree_depth'], rnd, image=image)
+        materials.append(mat)
+
+    clones = []
+    for i in range(int(config['materials'] * config['duplicate_ratio'])):
+        clones.append(materials[i % config['materials']].copy()) # named .001, .002...
+    return materials + clones
+
+
+def build_objects(config, rnd, materials):
+    scene = bpy.context.scene
+    for i in range(config['objects']):
+        mesh = bpy.data.meshes.new(f'bench_mesh_{i}')
+        mesh.from_pydata([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)], [], [(0, 1, 2, 3)])
+        for _ in range(config['slots_per_object']):
+            mesh.materials.append(rnd.choice(materials))
+        ob = bpy.data.objects.new(f'bench_ob_{i}', mesh)
+        scene.collection.objects.link(ob)
+        ob.select_set(True)
+
+
+def build_gp_objects(config, rnd):
+    scene = bpy.context.scene
+    gp_objects = []
+    for i in range(config['gp_objects']):
+        base = []
+        for j in range(max(1, config['gp_slots'] // 3)):
+            mat = bpy.data.materials.new(f'bench_gp_{i}_{j}')
+            bpy.data.materials.create_gpencil_data(mat)
+            mat.grease_pencil.color = (rnd.random(), rnd.random(), rnd.random(), 1.0)
+            base.append(mat)
+
+        gpd = bpy.data.grease_pencils.new(f'bench_gp_{i}')
+        for j in range(config['gp_slots']):
+            mat = base[j % len(base)]
+            # mix of same material, clones and empty slots
+            if j % 3 == 1:
+                mat = mat.copy()
+            elif j % 5 == 4:
+                mat = None
+            gpd.materials.append(mat)
+
+        layer = gpd.layers.new('bench')
+        for f in range(config['gp_frames']):
+            frame = layer.frames.new(f)
+            for _ in range(config['gp_strokes']):
+                stroke = frame.strokes.new()
+                stroke.points.add(4)
+                stroke.material_index = rnd.randrange(config['gp_slots'])
+
+        ob = bpy.data.objects.new(f'bench_gp_{i}', gpd)
+        scene.collection.objects.link(ob)
+        gp_objects.append(ob)
+    return gp_objects
+
+
+def generate(config, image_folder):
+    '''Reset file and build a synthetic scene from config, return dict of generated data
+    :image_folder: where textures are saved, reuse the same folder for every generation
+    with the same config (textures are written once) and delete it afterwards
+    '''
+    reset()
+    rnd = random.Random(config['seed'])
+    rng = np.random.default_rng(config['seed'])
+    folder = Path(image_folder) / f"seed_{config['seed']}"
+    folder.mkdir(parents=True, exist_ok=True)
+    images = [new_image(f'bench_tex_{i}', config['image_size'], rng, folder) for i in range(config['images'])]
+    materials = build_materials(config, rnd, images)
+    build_objects(config, rnd, materials)
+    gp_objects = build_gp_objects(config, rnd)
+
+    bpy.context.scene.mat_change_multiple = True
+    obs = [o for o in bpy.context.scene.objects if o.type == 'MESH']
+    if obs:
+        bpy.context.view_layer.objects.active = obs[0]
+    return {'materials': materials, 'gp_objects': gp_objects, 'image_folder': str(folder)}
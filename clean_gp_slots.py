@@ -1,7 +1,165 @@
 import bpy
-import addon_utils
+from . import profiling
+from . import modal_runner
+from . import scope
+
+def _remove_slot(ob, i):
+    '''Remove slot with operator (operate on active object)'''
+    if bpy.context.view_layer.objects.active != ob:
+        bpy.context.view_layer.objects.active = ob
+    ob.active_material_index = i
+    bpy.ops.object.material_slot_remove()
+
+def different_gp_mat(mata, matb, ob):
+    a = mata.grease_pencil
+    b = matb.grease_pencil
+    if a.color[:] != b.color[:]:
+        return f'! {ob.name}: {mata.name} and {matb.name} stroke color is different'
+    if a.fill_color[:] != b.fill_color[:]:
+        return f'! {ob.name}: {mata.name} and {matb.name} fill_color color is different'
+    if a.show_stroke != b.show_stroke:
+        return f'! {ob.name}: {mata.name} and {matb.name} stroke has different state'
+    if a.show_fill != b.show_fill:
+        return f'! {ob.name}: {mata.name} and {matb.name} fill has different state'
+
+## Clean dups
+def plan_mats_duplication(ob, skip_different_materials=True):
+    '''Find GP materials incremental duplication in object slots with their original material (read only)
+    Return (list of (slot index, duplication, original material), info tuple or None)
+    '''
+    import re
+    diff_ct = 0
+    replacements = []
+    if ob.type != 'GPENCIL':
+        return replacements, None
+    if not hasattr(ob, 'material_slots'):
+        return replacements, None
+    for i, ms in enumerate(ob.material_slots):
+        mat = ms.material
+        if not mat:
+            continue
+        match = re.search(r'(.*)\.\d{3}$', mat.name)
+        if not match:
+            continue
+        basemat = bpy.data.materials.get(match.group(1))
+        if not basemat:
+            continue
+        diff = different_gp_mat(mat, basemat, ob)
+        if diff:
+            print(diff)
+            diff_ct += 1
+            if skip_different_materials:
+                continue
+        replacements.append((i, mat, basemat))
+
+    if diff_ct:
+        return replacements, ('INFO', f'{diff_ct} mat skipped >> same name but different color settings!')
+    return replacements, None
+
+def apply_mats_duplication(ob, replacements):
+    for i, mat, basemat in replacements:
+        ob.material_slots[i].material = basemat
+        print(f'{ob.name} : slot {i} >> replaced {mat.name}')
+        mat.use_fake_user = False
+
+def clean_mats_duplication(ob, skip_different_materials=True):
+    '''Replace GP materials incremental duplication in object slots by original material'''
+    replacements, info = plan_mats_duplication(ob, skip_different_materials=skip_different_materials)
+    apply_mats_duplication(ob, replacements)
+    return info
+
+## fuse
+def fuse_object_mats(ob):
+    # remap all strokes at once and rebuild material list
+    from . import material_slots
+    if material_slots.compact_object_slots(ob, fuse=True) is not None:
+        return
+
+    # object-linked slots, fallback to per slot removal
+    for i in range(len(ob.material_slots))[::-1]:
+        ms = ob.material_slots[i]
+        mat = ms.material
+
+        # update mat list
+        mlist = [ms.material for ms in ob.material_slots if ms.material]
+        if mlist.count(mat) > 1:
+            # get first material in list
+            new_mat_id = mlist.index(mat)
+
+            # iterate in all strokes and replace with new_mat_id
+            for l in ob.data.layers:
+                for f in l.frames:
+                    for s in f.strokes:
+                        if s.material_index == i:
+                            s.material_index = new_mat_id
+
+            # delete slot (or add to the remove_slot list
+            _remove_slot(ob, i)
+
+def delete_empty_material_slots(ob):
+    from . import material_slots
+    if material_slots.compact_object_slots(ob, fuse=False, remove_empty=True) is not None:
+        return
 
-class AMT_OT_clean_gp_material_stack(bpy.types.Operator):
+    # object-linked slots, fallback to per slot removal
+    for i in range(len(ob.material_slots))[::-1]:
+        ms = ob.material_slots[i]
+        mat = ms.material
+        if not mat:
+            _remove_slot(ob, i)
+
+
+def clean_gp_material_stack(ob, clean_mats=True, skip_different_materials=True, fuse_mats=True, remove_empty_slots=True):
+    '''Run selected cleaning operations on a GP object material stack
+    Return info tuple (report type, message) or None
+    '''
+    return modal_runner.run_to_end(iter_clean_gp_material_stack(ob, clean_mats=clean_mats,
+        skip_different_materials=skip_different_materials, fuse_mats=fuse_mats, remove_empty_slots=remove_empty_slots))
+
+def iter_clean_gp_material_stack(ob, clean_mats=True, skip_different_materials=True, fuse_mats=True, remove_empty_slots=True):
+    '''Generator version of clean_gp_material_stack (modal_runner job)
+    Duplication replacement and slot compaction are planned first, yielding progress while
+    strokes material indices are read frame by frame, then applied at once in a single compaction
+    '''
+    from . import material_slots
+    prof = profiling.current
+    replacements, info = [], None
+    if clean_mats:
+        replacements, info = plan_mats_duplication(ob, skip_different_materials=skip_different_materials)
+
+    compact = (fuse_mats or remove_empty_slots) and ob.type == 'GPENCIL'
+    linked = compact and any(material_slots.has_object_linked_slots(o) for o in bpy.data.objects if o.data == ob.data)
+    index_arrays = None
+    if compact and not linked:
+        # slots content once duplications are replaced
+        materials = list(ob.data.materials)
+        for i, _mat, basemat in replacements:
+            materials[i] = basemat
+        kept, lut = material_slots.build_slot_lut(materials, fuse=fuse_mats, remove_empty=remove_empty_slots)
+        if len(kept) != len(materials):
+            total = material_slots.index_arrays_count(ob.data)
+            index_arrays = []
+            for item in material_slots.iter_index_arrays(ob.data):
+                index_arrays.append(item)
+                yield (len(index_arrays), total, 'Reading strokes')
+
+    # apply
+    with prof.stage('gp_duplication_clean'):
+        apply_mats_duplication(ob, replacements)
+    if linked:
+        # object-linked slots, fallback to per slot removal
+        if fuse_mats:
+            with prof.stage('gp_slot_fusion'):
+                fuse_object_mats(ob)
+        if remove_empty_slots:
+            with prof.stage('gp_empty_slot_removal'):
+                delete_empty_material_slots(ob)
+    elif index_arrays is not None:
+        material_slots.apply_slot_lut(ob.data, kept, lut, index_arrays)
+    return info
+
+
+class AMT_OT_clean_gp_material_stack(modal_runner.ModalJob, bpy.types.Operator):
     bl_idname = "materials.clean_gp_material_stack"
     bl_label = "Clean GPencil Material Stack"
     bl_description = "Clean materials duplication in active GP object stack"
@@ -43,105 +201,24 @@ class AMT_OT_clean_gp_material_stack(bpy.types.Operator):
         box.prop(self, 'use_fuses_mats')
         box = layout.box()
         box.prop(self, 'remove_empty_slots')
-        
-
-    def different_gp_mat(self, mata, matb):
-        a = mata.grease_pencil
-        b = matb.grease_pencil
-        if a.color[:] != b.color[:]:
-            return f'! {self.ob.name}: {mata.name} and {matb.name} stroke color is different'
-        if a.fill_color[:] != b.fill_color[:]:
-            return f'! {self.ob.name}: {mata.name} and {matb.name} fill_color color is different'
-        if a.show_stroke != b.show_stroke:
-            return f'! {self.ob.name}: {mata.name} and {matb.name} stroke has different state'
-        if a.show_fill != b.show_fill:
-            return f'! {self.ob.name}: {mata.name} and {matb.name} fill has different state'
-
-    ## Clean dups
-    def clean_mats_duplication(self, ob):
-        import re
-        diff_ct = 0
-        todel = []
-        if ob.type != 'GPENCIL':
-            return
-        if not hasattr(ob, 'material_slots'):
-            return
-        for i, ms in enumerate(ob.material_slots):
-            mat = ms.material
-            if not mat:
-                continue
-            match = re.search(r'(.*)\.\d{3}$', mat.name)
-            if not match:
-                continue
-            basemat = bpy.data.materials.get(match.group(1))
-            if not basemat:
-                continue
-            diff = self.different_gp_mat(mat, basemat)
-            if diff:
-                print(diff)
-                diff_ct += 1
-                if self.skip_different_materials:
-                    continue
-
-            if mat not in todel:
-                todel.append(mat)
-            ms.material = basemat
-            print(f'{ob.name} : slot {i} >> replaced {mat.name}')
-            mat.use_fake_user = False
-
-        if diff_ct:
-            return('INFO', f'{diff_ct} mat skipped >> same name but different color settings!')
-
-    ## fuse
-    def fuse_object_mats(self, ob):
-        for i in range(len(ob.material_slots))[::-1]:
-            ms = ob.material_slots[i]
-            mat = ms.material
-            
-            # update mat list
-            mlist = [ms.material for ms in ob.material_slots if ms.material]
-            if mlist.count(mat) > 1:
-                # get first material in list
-                new_mat_id = mlist.index(mat)
-                
-                # iterate in all strokes and replace with new_mat_id
-                for l in ob.data.layers:
-                    for f in l.frames:
-                        for s in f.strokes:
-                            if s.material_index == i:
-                                s.material_index = new_mat_id
-
-                # delete slot (or add to the remove_slot list
-                ob.active_material_index = i
-                bpy.ops.object.material_slot_remove()
-
-    def delete_empty_material_slots(self, ob):
-        for i in range(len(ob.material_slots))[::-1]:
-            ms = ob.material_slots[i]
-            mat = ms.material
-            if not mat:
-                ob.active_material_index = i
-                bpy.ops.object.material_slot_remove()
 
     def execute(self, context):
-        ob = context.object
-        info = None
-
         if not self.use_clean_mats and not self.use_fuses_mats and not self.remove_empty_slots:            
             self.report({'ERROR'}, 'At least one operation should be selected')
             return {"CANCELLED"}
 
-        if self.use_clean_mats:
-            info = self.clean_mats_duplication(ob)
-        if self.use_fuses_mats:
-            self.fuse_object_mats(ob)
-        if self.remove_empty_slots:
-            self.delete_empty_material_slots(ob)
-        
-        if info:
-            self.report({info[0]}, info[1])
+        if scope.is_linked(context.object) or scope.is_linked(context.object.data):
+            self.report({'ERROR'}, f'{context.object.name} is linked from a library, its materials cannot be changed')
+            return {"CANCELLED"}
+
+        return self.run_job(context)
 
-        return {"FINISHED"}
+    def job(self, context):
+        return iter_clean_gp_material_stack(context.object,
+            clean_mats=self.use_clean_mats,
+            skip_different_materials=self.skip_different_materials,
+            fuse_mats=self.use_fuses_mats,
+            remove_empty_slots=self.remove_empty_slots)
 
 
 def material_gp_clean_menu(self, context):
@@ -149,21 +226,23 @@ def material_gp_clean_menu(self, context):
     layout = self.layout
     layout.operator("materials.clean_gp_material_stack", text='Clean Material Slots', icon='NODE_MATERIAL')
 
-# avoid unregister error if Gp toolbox was unregistered before
-registered = True
+# avoid unregister error if Gp toolbox was enabled or unregistered in between
+registered = False
 
 def register():
     global registered
-    # Don't register if gp toolbox is loaded (same ops)
-    if not any(addon_utils.check('gp_toolbox')):
-        bpy.utils.register_class(AMT_OT_clean_gp_material_stack)
-        bpy.types.GPENCIL_MT_material_context_menu.append(material_gp_clean_menu)
-    else:
-        registered = False
+    # Don't register if gp toolbox is enabled (same ops)
+    # lookup in preferences: no addon module scan and true even if gp toolbox is enabled after this addon
+    if 'gp_toolbox' in bpy.context.preferences.addons:
+        return
+    bpy.utils.register_class(AMT_OT_clean_gp_material_stack)
+    bpy.types.GPENCIL_MT_material_context_menu.append(material_gp_clean_menu)
+    registered = True
 
 def unregister():
+    global registered
     if not registered:
         return
-    if not any(addon_utils.check('gp_toolbox')):
-        bpy.types.GPENCIL_MT_material_context_menu.remove(material_gp_clean_menu)
-        bpy.utils.unregister_class(AMT_OT_clean_gp_material_stack)
\ No newline at end of file
+    bpy.types.GPENCIL_MT_material_context_menu.remove(material_gp_clean_menu)
+    bpy.utils.unregister_class(AMT_OT_clean_gp_material_stack)
+    registered = False
\ No newline at end of file
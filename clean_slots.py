@@ -1,5 +1,9 @@
 import bpy, re
-import numpy as np
+from . import profiling
+from . import scope
+from . import modal_runner
+from .core import signature
+# material_slots import numpy, it is imported on first use
 
 # TODO option : Delete duplication if it isn't assigned at all (a bit hazardous)
 
@@ -41,13 +45,153 @@ attr_exclusion = [
 ]
 # animation_data
 
-def up_node_tree(node, nlist=[]):
-    '''Recursively go up a tree and return a list of each nodes'''
-    for input in node.inputs:
-        if input.is_linked:
-            for link in input.links:
-                nlist = up_node_tree(link.from_node, nlist)
-    return nlist+[node]
+## --- Property signature
+
+def _id_props():
+    return {p.identifier for p in bpy.types.ID.bl_rna.properties}
+
+def _node_base_props():
+    # generic node UI properties, but keep mute which change the result
+    return {p.identifier for p in bpy.types.Node.bl_rna.properties} - {'mute'}
+
+signature_exclusion = {
+'paint_active_slot',
+'paint_clone_slot',
+'inputs',
+'outputs',
+'internal_links',
+'dimensions',
+}
+
+# nodes storing their value in output sockets (outputs are not in node records otherwise)
+output_value_nodes = {
+'ShaderNodeRGB',
+'ShaderNodeValue',
+'ShaderNodeNormal',
+}
+
+increment_pattern = re.compile(r'(.*)\.\d{3}$')
+
+def id_full_name(id):
+    return id.name_full
+
+def id_base_name(id):
+    '''Name of datablock without increment suffix (images and node groups appended with a material get a .001)'''
+    match = increment_pattern.match(id.name)
+    return match.group(1) if match else id.name
+
+def _plain_value(value, id_name=id_full_name):
+    '''Return property value as plain python value (tuple for arrays and enum flags, id_name(datablock) for datablocks)'''
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bpy.types.ID):
+        return id_name(value)
+    if isinstance(value, set): # enum flags
+        return tuple(sorted(value))
+    try:
+        return tuple(_plain_value(v, id_name) for v in value)
+    except TypeError:
+        return repr(value)
+
+def _rna_record(struct, exclude=(), depth=2, id_name=id_full_name):
+    '''Return plain values of every rna property of struct (nested structs are followed up to depth)'''
+    record = []
+    for prop in struct.bl_rna.properties:
+        ident = prop.identifier
+        if ident in exclude or ident in attr_exclusion or ident in signature_exclusion:
+            continue
+        value = getattr(struct, ident, None)
+        if prop.type == 'POINTER':
+            if value is None or isinstance(value, bpy.types.ID):
+                record.append((ident, _plain_value(value, id_name)))
+            elif depth:
+                record.append((ident, _rna_record(value, depth=depth-1, id_name=id_name)))
+        elif prop.type == 'COLLECTION':
+            if depth:
+                record.append((ident, tuple(_rna_record(item, depth=depth-1, id_name=id_name) for item in value)))
+        else:
+            record.append((ident, _plain_value(value, id_name)))
+    return tuple(record)
+
+## --- Node tree canonical form
+
+def _link_sort_key(link):
+    return (link.from_node.bl_idname, link.from_socket.identifier)
+
+def iter_canonical_nodes(output, id_name=id_full_name):
+    '''Iteratively walk nodes upstream of output in a canonical order and yield one record per node
+
+    Order is breadth first, inputs in socket order, links sorted by source node type and socket identifier,
+    so it does not depend on node names or link creation order.
+    Each node is visited once, even if reached by multiple paths.
+    Record (plain values only): (bl_idname, node group name, node settings, inputs, outputs)
+    inputs: (socket identifier, True, ((source socket identifier, source canonical index), ...)) if linked
+            (socket identifier, False, default value) if not
+    outputs: ((socket identifier, default value), ...) for nodes in output_value_nodes, else empty
+    :id_name: function giving the recorded name of datablocks (node groups, images...)
+    '''
+    from collections import deque
+    index = {output.as_pointer(): 0}
+    queue = deque((output,))
+    node_base_props = _node_base_props()
+    while queue:
+        node = queue.popleft()
+        inputs = []
+        for input in node.inputs:
+            if input.is_linked:
+                sources = []
+                for link in sorted((l for l in input.links if l.is_valid), key=_link_sort_key):
+                    key = link.from_node.as_pointer()
+                    if key not in index:
+                        index[key] = len(index)
+                        queue.append(link.from_node)
+                    sources.append((link.from_socket.identifier, index[key]))
+                inputs.append((input.identifier, True, tuple(sources)))
+            elif hasattr(input, 'default_value'):
+                inputs.append((input.identifier, False, _plain_value(input.default_value, id_name)))
+
+        outputs = ()
+        if node.bl_idname in output_value_nodes:
+            outputs = tuple((output.identifier, _plain_value(output.default_value, id_name))
+                            for output in node.outputs if hasattr(output, 'default_value'))
+
+        # node_tree is in attr_exclusion (material one), but group node datablock matter
+        group = id_name(node.node_tree) if getattr(node, 'node_tree', None) else None
+        yield (node.bl_idname,
+               group,
+               _rna_record(node, exclude=node_base_props, id_name=id_name),
+               tuple(inputs),
+               outputs)
+
+def node_trees_match(out_a, out_b, verbose=True):
+    '''Compare node trees upstream of two output nodes using their canonical forms
+    Datablocks (node groups, images) are compared by name without increment suffix
+    (Group and Group.001 match, as they do for materials). Stop at first difference. Return True if similar
+    '''
+    from itertools import zip_longest
+    for node_a, node_b in zip_longest(iter_canonical_nodes(out_a, id_base_name), iter_canonical_nodes(out_b, id_base_name)):
+        if node_a is None or node_b is None:
+            return False
+        if node_a[:2] != node_b[:2] or not signature.values_close(node_a[2], node_b[2]):
+            return False
+        if not signature.values_close(node_a[4], node_b[4]):
+            if verbose:
+                print(f'{out_a.id_data.name} > {node_a[0]} outputs: {node_a[4]} != {node_b[4]} ({out_b.id_data.name})')
+            return False
+        inputs_a, inputs_b = node_a[3], node_b[3]
+        if len(inputs_a) != len(inputs_b):
+            return False
+        for (id_a, linked_a, value_a), (id_b, linked_b, value_b) in zip(inputs_a, inputs_b):
+            if id_a != id_b or linked_a != linked_b:
+                return False
+            if linked_a:
+                if value_a != value_b:
+                    return False
+            elif not signature.values_close(value_a, value_b):
+                if verbose:
+                    print(f'{out_a.id_data.name} > {node_a[0]} > {id_a}: {value_a} != {value_b} ({out_b.id_data.name})')
+                return False
+    return True
 
 def get_shader_output(m):
     outputs = [n for n in m.node_tree.nodes if n.type == 'OUTPUT_MATERIAL' and n.is_active_output]
@@ -78,84 +222,208 @@ def mats_similarity_check(a, b, check_settings=True, check_node_tree=True):
         outb = get_shader_output(b)
         if not outa or not outb:
             return
-        ## just check output connected node_trees have same nodetypes
-        for na, nb in zip(up_node_tree(outa), up_node_tree(outb)):
-            if na.type != nb.type:
-                # print(f'type : {na.type} != {nb.type}')
-                return
+        if not node_trees_match(outa, outb):
+            return
 
-            for i1, i2 in zip(na.inputs, nb.inputs):
-                if i1.is_linked != i2.is_linked:
-                    return
-                if i1.is_linked:
-                    continue
-                if not hasattr(i1, 'default_value'): 
-                    continue
+    return True
 
-                ## use isclose since value approximation break similarity checking
-                if not np.isclose(i1.default_value, i2.default_value).all():
-                    print(f'{a.name} > {na.name} > {i1.name}: {i1.default_value} != {i2.default_value} ({b.name})')
-                    return 
+## --- Material signature
 
-    return True
+def material_record(mat, check_settings=True, check_node_tree=True):
+    '''Return material content (settings, node topology and values) as nested tuples of plain values'''
+    record = []
+    if check_settings:
+        # diffuse_color is in attr_exclusion (duplications may differ only by viewport color),
+        # but it is the color of non node materials: identical materials must share it
+        record.append(_rna_record(mat, exclude=_id_props()))
+        record.append(_plain_value(mat.diffuse_color))
+    if check_node_tree and mat.use_nodes and mat.node_tree:
+        out = get_shader_output(mat)
+        record.append(tuple(iter_canonical_nodes(out)) if out else None)
+    return tuple(record)
+
+def material_signature(mat, check_settings=True, check_node_tree=True, tolerance=1e-4):
+    '''Return a stable hash of material content (settings, node topology and values)
+    Two materials with same signature are considered identical (float compared with tolerance)
+    '''
+    return signature.signature_hash(material_record(mat, check_settings, check_node_tree), tolerance)
+
+def group_identical_materials(materials=None, check_settings=True, check_node_tree=True, tolerance=1e-4):
+    '''Bucket materials by signature in a single pass (default to all materials in file)
+    Return list of groups (list of materials) containing more than one material
+    '''
+    if materials is None:
+        materials = bpy.data.materials
+    buckets = {}
+    with profiling.current.stage('signature_hashing'):
+        for mat in materials:
+            sig = signature.signature_hash(material_record(mat, check_settings, check_node_tree), tolerance)
+            buckets.setdefault(sig, []).append(mat)
+    profiling.current.count('signatures_computed', len(materials))
+    return [mats for mats in buckets.values() if len(mats) > 1]
+
+def merge_identical_materials(skip_fake_user=False, force_delete=False):
+    '''Remap users of every identical material to a single one (the one with shortest name)
+    Return number of merged materials
+    '''
+    merged = 0
+    todel = []
+    pool = [m for m in bpy.data.materials if not (skip_fake_user and m.use_fake_user) and not m.library]
+    for group in group_identical_materials(pool):
+        group.sort(key=lambda m: (len(m.name), m.name))
+        keep = group[0]
+        for mat in group[1:]:
+            print(f'{mat.name} >> merged into {keep.name}')
+            mat.use_fake_user = False
+            mat.user_remap(keep)
+            todel.append(mat)
+            merged += 1
+
+    if force_delete:
+        for m in reversed(todel):
+            bpy.data.materials.remove(m)
+    return merged
+
+
+def get_target_objects(targets='ACTIVE', context=None):
+    '''Return objects for targets in ('ACTIVE', 'SELECTED', 'COLLECTION', 'SCENE', 'FILE') (see scope.scopes)'''
+    return scope.get_objects(targets, context=context)
+
+def build_duplicate_map(similar_check=False, skip_fake_user=False, similarity_cache=None):
+    """Map every incremental duplication in file (X.001, X.002) to its original material (X)
+    See iter_duplicate_map
+    """
+    return modal_runner.run_to_end(iter_duplicate_map(similar_check, skip_fake_user, similarity_cache))
+
+def iter_duplicate_map(similar_check=False, skip_fake_user=False, similarity_cache=None):
+    """Map every incremental duplication in file (X.001, X.002) to its original material (X)
+    Generator yielding progress between duplications (modal_runner job), only read data
+    Scan bpy.data.materials once. X.001.001 is mapped to X if similar all along the chain.
+    :similar_check: map only if settings/node_tree are similar
+    :skip_fake_user: skip every material that have a fake user
+    :similarity_cache: dict storing similarity result per material pair (reusable between calls)
+    Return dict {duplicate: original}
+    """
+    if similarity_cache is None:
+        similarity_cache = {}
+
+    names = {}
+    for mat in bpy.data.materials:
+        # local material take precedence over linked one with same name (as bpy.data.materials.get)
+        if mat.library is None or mat.name not in names:
+            names[mat.name] = mat
+
+    direct = {}
+    for mat in bpy.data.materials:
+        if skip_fake_user and mat.use_fake_user:
+            continue
+        match = increment_pattern.match(mat.name)
+        if not match:
+            continue
+        base = names.get(match.group(1))
+        if base and base is not mat:
+            direct[mat] = base
+
+    prof = profiling.current
+
+    def similar(base, mat):
+        key = (base.as_pointer(), mat.as_pointer())
+        if key not in similarity_cache:
+            prof.count('similarity_checks')
+            with prof.stage('similarity_check'):
+                similarity_cache[key] = bool(mats_similarity_check(base, mat))
+        return similarity_cache[key]
+
+    dup_map = {}
+    for i, mat in enumerate(direct):
+        yield (i, len(direct), 'Comparing duplications')
+        target = None
+        base = direct.get(mat)
+        seen = {mat}
+        while base is not None and base not in seen:
+            if similar_check and not similar(base, mat):
+                break
+            target = base
+            seen.add(base)
+            base = direct.get(base)
+        if target is not None:
+            dup_map[mat] = target
+
+    # a target replaced itself means the chain was broken by a different material, keep it untouched
+    return {dup: base for dup, base in dup_map.items() if base not in dup_map}
 
 def replace_increment_duplication(targets='ACTIVE', similar_check=False, skip_fake_user=False, force_delete=False):
     """Replace duplication (.001, .002) of a material in object slots by the original material (if any)
-    :targets: Select which material slots to scan to affect in ('ACTIVE', 'SELECTED', 'ALL')
+    See iter_replace_increment_duplication
+    """
+    objects = get_target_objects(targets) if targets != 'FILE' else None
+    return modal_runner.run_to_end(iter_replace_increment_duplication(targets, similar_check, skip_fake_user, force_delete, objects=objects))
+
+def iter_replace_increment_duplication(targets='ACTIVE', similar_check=False, skip_fake_user=False, force_delete=False, objects=None, skipped=None):
+    """Replace duplication (.001, .002) of a material in object slots by the original material (if any)
+    Generator (modal_runner job): yield progress while duplications are compared, then replace all at once
+    :targets: Select which material slots to scan to affect in ('ACTIVE', 'SELECTED', 'COLLECTION', 'SCENE', 'FILE')
+        'FILE' remap every users of the duplication in the blend (objects and data outside of scene included)
+    :objects: objects of targets, resolved by the caller (generator body must not read context), unused with 'FILE'
+    :skipped: optional list, objects having slots that can't be changed (linked from a library) are appended to it
     :similar_check: replace material only if settings/node_tree are exactly similar (approximate method, dont check node values)
     :skip_fake_user: skip every material that have a fake user
     :force_delete: True remove the material from blend immediately (usefull to delete fake_user materials).
     """
-    
-    if targets == 'ACTIVE':
-        pool = [bpy.context.object]
-    elif targets == 'SELECTED':
-        pool = bpy.context.selected_objects
-    elif targets == 'ALL':
-        pool = bpy.context.scene.objects
-    else:
-        pool = []
-    
+    prof = profiling.current
+    with prof.stage('duplicate_map'):
+        dup_map = yield from iter_duplicate_map(similar_check=similar_check, skip_fake_user=skip_fake_user)
+    prof.count('duplicates_found', len(dup_map))
+
     matnum = 0
-    todel = []
-    for ob in pool:
-        if not hasattr(ob, 'material_slots'):
-            continue
-        for i, ms in enumerate(ob.material_slots):
-            mat = ms.material
-            if not mat:
-                continue
-            
-            if skip_fake_user and mat.use_fake_user:
-                continue
+    replaced = {} # used as ordered set
 
-            match = re.search(r'(.*)\.\d{3}$', mat.name)
-            if not match:
+    if targets == 'FILE':
+        for mat, basemat in dup_map.items():
+            mat.use_fake_user = False
+            users = mat.users
+            if not users:
                 continue
+            mat.user_remap(basemat)
+            print(f'{mat.name} >> replaced by {basemat.name} ({users} users)')
+            replaced[mat] = None
+            matnum += users
 
-            basemat = bpy.data.materials.get(match.group(1))
-            if not basemat:
-                continue
-            
-            if similar_check and not mats_similarity_check(basemat, mat):
+    else:
+        skipped = [] if skipped is None else skipped
+        for ob in objects:
+            if not hasattr(ob, 'material_slots'):
                 continue
+            for i, ms in enumerate(ob.material_slots):
+                mat = ms.material
+                basemat = dup_map.get(mat)
+                if basemat is None:
+                    continue
+                if not scope.slot_editable(ob, ms):
+                    if not skipped or skipped[-1] is not ob:
+                        skipped.append(ob)
+                    continue
 
-            if mat not in todel:
-                todel.append(mat)
+                replaced[mat] = None
+                ms.material = basemat
+                print(f'{ob.name} : slot {i} >> replaced {mat.name}')
+                matnum += 1
+                mat.use_fake_user = False
 
-            ms.material = basemat
-            print(f'{ob.name} : slot {i} >> replaced {mat.name}')
-            matnum += 1
-            mat.use_fake_user = False
+        if skipped:
+            print(f'{len(skipped)} objects with duplications skipped (linked from a library)')
+            prof.count('objects_skipped', len(skipped))
 
     if force_delete:
-        for m in reversed(todel):
-            bpy.data.materials.remove(m)
+        with prof.stage('material_removal'):
+            for m in reversed(list(replaced)):
+                bpy.data.materials.remove(m)
     
+    prof.count('slots_replaced' if targets != 'FILE' else 'users_remapped', matnum)
     return matnum
 
 
-class AM_OT_replace_mat_duplication(bpy.types.Operator):
+class AM_OT_replace_mat_duplication(modal_runner.ModalJob, bpy.types.Operator):
     bl_idname = "materials.replace_mat_duplication"
     bl_label = "Replace Material Duplication"
     bl_description = "Delete materials incremental duplications (.001 .002 ...) and replace in slot by material holding original name"
@@ -164,11 +432,7 @@ class AM_OT_replace_mat_duplication(bpy.types.Operator):
     target : bpy.props.EnumProperty(
     name="Target Objects", description="Choose objects targets to check material slots",
     default='ACTIVE',
-    items=(
-        ('ACTIVE', 'Active', 'Replace incremental duplication in active objects material slots', 0),
-        ('SELECTED', 'Selected', 'Replace incremental duplication in selected objects material slots', 1),   
-        ('ALL', 'All', 'Replace incremental duplication in all objects material slots', 2),   
-        ))
+    items=scope.enum_items())
 
     # use_remove_dup : bpy.props.BoolProperty(name="Remove Duplication", 
     #     description="All duplicated material (with suffix .001, .002 ...) will be replaced by the material with clean name (if found in scene)" ,
@@ -186,9 +450,13 @@ class AM_OT_replace_mat_duplication(bpy.types.Operator):
         description="Replaced duplication will be immediately deleted after being replaced\nThis is usefull to be sure duplication with fake users are not kept in the blend",
         default=False)
 
-    # remove_empty_slots : bpy.props.BoolProperty(name="Remove Empty Slots", 
-    #     description="Remove slots that haven't any material attached ", 
-    #     default=True)
+    fuse_slots : bpy.props.BoolProperty(name="Fuse Material Slots", 
+        description="After replacement, fuse slots of mesh objects that use the same material",
+        default=False)
+
+    remove_empty_slots : bpy.props.BoolProperty(name="Remove Empty Slots", 
+        description="After replacement, remove slots of mesh objects that haven't any material attached\n(faces assigned to a removed slot go to previous slot)", 
+        default=False)
 
     @classmethod
     def poll(cls, context):
@@ -207,6 +475,8 @@ class AM_OT_replace_mat_duplication(bpy.types.Operator):
         box.prop(self, 'skip_different_materials')
         box.prop(self, 'skip_fake_user')
         box.prop(self, 'force_delete')
+        box.prop(self, 'fuse_slots')
+        box.prop(self, 'remove_empty_slots')
 
         # box.prop(self, 'use_remove_dup')
         # if self.use_remove_dup:
@@ -216,17 +486,6 @@ class AM_OT_replace_mat_duplication(bpy.types.Operator):
         # if self.use_remove_dup:
         #     box.prop(self, 'force_delete')
 
-        # box = layout.box()
-        # box.prop(self, 'remove_empty_slots')
-
-    ## override to affect non-active objects ?
-    # def delete_empty_material_slots(self, ob):
-    #     for i in range(len(ob.material_slots))[::-1]:
-    #         ms = ob.material_slots[i]
-    #         mat = ms.material
-    #         if not mat:
-    #             ob.active_material_index = i
-    #             bpy.ops.object.material_slot_remove()
 
     def execute(self, context):
         ob = context.object
@@ -242,14 +501,89 @@ class AM_OT_replace_mat_duplication(bpy.types.Operator):
         # if self.remove_empty_slots:
         #     self.delete_empty_material_slots(ob)
 
-        info = replace_increment_duplication(targets=self.target, similar_check=self.skip_different_materials, skip_fake_user=self.skip_fake_user, force_delete=self.force_delete)
-        self.report({'INFO'}, f'{info} material slot replaced')
-        
-        # if info:
-        #     self.report({info[0]}, info[1])
-        # else:
-        #     self.report({'WARNING'}, '')
+        return self.run_job(context)
+
+    def job(self, context):
+        # targets are resolved here, the generator runs from timer ticks
+        objects = get_target_objects(self.target, context=context)
+        return self.replace_job(objects, self.target, self.skip_different_materials, self.skip_fake_user, self.force_delete,
+                                self.fuse_slots, self.remove_empty_slots)
+
+    @staticmethod
+    def replace_job(objects, target, similar_check, skip_fake_user, force_delete, fuse_slots, remove_empty_slots):
+        linked = []
+        info = yield from iter_replace_increment_duplication(targets=target, similar_check=similar_check,
+            skip_fake_user=skip_fake_user, force_delete=force_delete, objects=objects if target != 'FILE' else None,
+            skipped=linked)
+        message = f'{info} material slot replaced'
+        if linked:
+            message += f', {len(linked)} linked objects skipped'
+
+        if not fuse_slots and not remove_empty_slots:
+            return ('WARNING' if linked else 'INFO', message)
+
+        # duplicate and empty slots are collapsed in a single pass per mesh
+        from . import material_slots
+        meshes = [o for o in objects if o.type == 'MESH']
+        removed, skipped = material_slots.compact_objects_slots(meshes, fuse=fuse_slots, remove_empty=remove_empty_slots)
+        if skipped:
+            print(f'Slots not compacted on {len(skipped)} objects (edit mode, object-linked slots or linked data)')
+        return ('WARNING' if linked else 'INFO', f'{message}, {removed} slots removed')
+
+
+class AM_OT_merge_identical_materials(bpy.types.Operator):
+    bl_idname = "materials.merge_identical_materials"
+    bl_label = "Merge Identical Materials"
+    bl_description = "Find identical materials in whole file (whatever their names) and replace them by a single one"
+    bl_options = {"REGISTER", "UNDO"}
+
+    skip_fake_user : bpy.props.BoolProperty(name="Skip Fake User", 
+        description="Materials with fake user will be untouched, even if they are identical",
+        default=False)
+    
+    force_delete : bpy.props.BoolProperty(name="Direct Delete", 
+        description="Merged materials will be immediately deleted\nThis is usefull to be sure materials with fake users are not kept in the blend",
+        default=False)
 
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self, width=400)
+
+    def draw(self, context):
+        layout = self.layout
+        layout.label(text='Replace identical materials by the one with shortest name')
+        box = layout.box()
+        box.prop(self, 'skip_fake_user')
+        box.prop(self, 'force_delete')
+
+    def execute(self, context):
+        with profiling.profile_operator(self.bl_label):
+            merged = merge_identical_materials(skip_fake_user=self.skip_fake_user, force_delete=self.force_delete)
+        self.report({'INFO'}, f'{merged} identical materials merged')
+        return {"FINISHED"}
+
+
+class AM_OT_remove_empty_slots(bpy.types.Operator):
+    bl_idname = "materials.remove_empty_slots"
+    bl_label = "Remove Empty Material Slots"
+    bl_description = "Remove material slots without material on targeted objects (mesh, curve, text, grease pencil)"
+    bl_options = {"REGISTER", "UNDO"}
+
+    target : bpy.props.EnumProperty(
+    name="Target Objects", description="Choose objects targets to remove empty material slots",
+    default='SELECTED',
+    items=scope.enum_items())
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        from . import material_slots
+        with profiling.profile_operator(self.bl_label):
+            removed, skipped = material_slots.remove_empty_slots(get_target_objects(self.target, context=context))
+        if skipped:
+            self.report({'WARNING'}, f'{removed} empty slots removed, {len(skipped)} objects skipped (edit mode, object-linked slots or linked data)')
+        else:
+            self.report({'INFO'}, f'{removed} empty slots removed')
         return {"FINISHED"}
 
 
@@ -257,9 +591,13 @@ def material_clean_menu(self, context):
     '''To append to MATERIAL_MT_context_menu'''
     layout = self.layout
     layout.operator("materials.replace_mat_duplication", text='Remove Duplications', icon='NODE_MATERIAL')
+    layout.operator("materials.merge_identical_materials", text='Merge Identical Materials', icon='NODE_MATERIAL')
+    layout.operator("materials.remove_empty_slots", text='Remove Empty Slots', icon='NODE_MATERIAL')
 
 classes = (
 AM_OT_replace_mat_duplication,
+AM_OT_merge_identical_materials,
+AM_OT_remove_empty_slots,
 )
 
 def register():
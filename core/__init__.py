@@ -0,0 +1,42 @@
+'''bpy-free computations of the addon (color palette matching, material signature math, texture color cache)
+
+Everything in this package can be imported by a plain python with numpy,
+in worker processes, tests or benchmarks, without starting Blender.
+Public names are resolved on first access, so importing the package
+doesn't import numpy (only `colors` is light enough for registration).
+'''
+
+import importlib
+import sys
+
+_exports = {
+    'ColorPalette': 'palette',
+    'read_json': 'palette',
+    'load_file': 'palette',
+    'srgb_to_linearrgb': 'colors',
+    'hex_to_rgb': 'colors',
+    'metrics': 'colors',
+    'quantize': 'signature',
+    'values_close': 'signature',
+    'signature_hash': 'signature',
+    'dominant_color': 'sampling',
+}
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    return getattr(importlib.import_module(f'.{module}', __name__), name)
+
+
+def __dir__():
+    return sorted({*globals(), *_exports})
+
+
+def clear_caches():
+    '''Drop session caches of loaded modules (nothing is imported to do so)'''
+    for name in ('palette', 'texture_cache'):
+        module = sys.modules.get(f'{__name__}.{name}')
+        if module is not None:
+            module.clear_registry()
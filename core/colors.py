@@ -0,0 +1,32 @@
+'''Scalar color helpers and matching options.
+
+Imports nothing heavy (no numpy), so it can be used at addon registration.
+'''
+
+# Matching metrics, (identifier, name, description) as used by AM_preferences enum
+metrics = (
+    ('RGB', 'Linear RGB', 'Euclidean distance in linear rgb (fastest)'),
+    ('LAB', 'CIELAB', 'Euclidean distance in CIELAB space (deltaE 1976)'),
+    ('CIEDE2000', 'CIEDE2000', 'Perceptual deltaE 2000 distance (best match in darks)'),
+)
+
+
+#-# seem like it's needed to be passed to linear in blender for correct result
+#-# https://blender.stackexchange.com/questions/158896/how-set-hex-in-rgb-node-python/158902
+
+def srgb_to_linearrgb(c: float) -> float:
+    if   c < 0:       return 0
+    elif c < 0.04045: return c/12.92
+    else:             return ((c+0.055)/1.055)**2.4
+
+
+def hex_to_rgb(h: str) -> tuple:
+    '''Convert a hexadecimal color value ('#rrggbb' or '#rgb') to a linear rgb 3-tuple of floats'''
+    h = h[1:] if h.startswith('#') else h
+    if len(h) == 3:
+        h = ''.join(c*2 for c in h)
+    h = int(h, 16)
+    r = (h & 0xff0000) >> 16
+    g = (h & 0x00ff00) >> 8
+    b = (h & 0x0000ff)
+    return tuple([srgb_to_linearrgb(c/0xff) for c in (r,g,b)])
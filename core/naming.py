@@ -0,0 +1,71 @@
+'''Plan names of a batch renaming so every final name is unique before anything is renamed.
+
+Assigning an already used name to a datablock makes Blender add a `.001` suffix,
+scanning existing names on each assignment, and these suffixes are later
+seen as duplications by the material cleaner. Here collisions are solved in
+memory with sets, with alternative names or deterministic number suffixes.
+This module does not import bpy.
+'''
+
+# Collision handling, (identifier, name, description) as used by AM_preferences enum
+collision_modes = (
+    ('SUFFIX', 'Number Suffix', 'Add a number to the color name ("Red 2", "Red 3"...)'),
+    ('NEAREST', 'Next Nearest Color', 'Use the next nearest color name not used yet (number suffix if none is close)'),
+)
+
+# max length of a blender ID name (bytes)
+MAX_NAME_LENGTH = 63
+
+
+def with_suffix(name: str, number: int, max_length: int = MAX_NAME_LENGTH) -> str:
+    '''Return name with a number suffix ("Red 2"), base name is cut to fit in max_length bytes'''
+    suffix = f' {number}'
+    base = name.encode('utf-8')[:max_length - len(suffix)].decode('utf-8', 'ignore')
+    return base + suffix
+
+
+def plan_names(current, wanted, existing, alternatives=None) -> list:
+    '''Resolve name collisions of a batch renaming in memory
+    :current: current name of each renamed item
+    :wanted: wanted name of each renamed item
+    :existing: names used by items not renamed (they are kept)
+    :alternatives: optional function(index) returning other acceptable names for item, in order of preference
+    Return list of final names, all distinct and not in existing
+    Items already having their wanted name keep it, then items get their name in passed order.
+    '''
+    taken = set(existing)
+    final = [None] * len(wanted)
+    for i, (cur, name) in enumerate(zip(current, wanted)):
+        if cur == name and name not in taken:
+            final[i] = name
+            taken.add(name)
+
+    next_number = {} # base name -> next suffix number to try
+    for i, name in enumerate(wanted):
+        if final[i] is not None:
+            continue
+        if name in taken and alternatives is not None:
+            name = next((alt for alt in alternatives(i) if alt not in taken), name)
+        if name in taken:
+            base = wanted[i]
+            number = next_number.get(base, 2)
+            name = with_suffix(base, number)
+            while name in taken:
+                number += 1
+                name = with_suffix(base, number)
+            next_number[base] = number + 1
+        final[i] = name
+        taken.add(name)
+    return final
+
+
+def temporary_names(count: int, used) -> list:
+    '''Return count names not in used, to free names during a two pass renaming'''
+    names = []
+    i = 0
+    while len(names) < count:
+        name = f'~automat_tmp_{i}'
+        if name not in used:
+            names.append(name)
+        i += 1
+    return names
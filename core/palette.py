@@ -0,0 +1,455 @@
+'''Color palette used to find the nearest color name.
+
+The database is parsed and linearized once into a numpy array,
+then a whole list of colors can be named in a single vectorized call.
+
+This module does not import bpy.
+'''
+
+import numpy as np
+
+
+from .colors import metrics
+
+
+def srgb_to_linear(values):
+    '''Vectorized srgb -> linear conversion (same curve as srgb_to_linearrgb)'''
+    values = np.clip(np.asarray(values, dtype=np.float32), 0.0, None)
+    return np.where(values < 0.04045,
+                    values / 12.92,
+                    ((values + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+
+def parse_hex(hex_codes):
+    '''Return an (N, 3) float32 array of srgb values in 0-1 range from a list of hex strings'''
+    codes = []
+    for h in hex_codes:
+        h = h.strip().lstrip('#')
+        if len(h) == 3:
+            h = ''.join(c * 2 for c in h)
+        codes.append(int(h, 16))
+    codes = np.asarray(codes, dtype=np.uint32)
+    rgb = np.empty((len(codes), 3), dtype=np.float32)
+    rgb[:, 0] = (codes >> 16) & 0xff
+    rgb[:, 1] = (codes >> 8) & 0xff
+    rgb[:, 2] = codes & 0xff
+    return rgb / 255.0
+
+
+## --- Perceptual color space
+
+# linear srgb (D65) -> XYZ
+_RGB_TO_XYZ = np.array((
+    (0.4124564, 0.3575761, 0.1804375),
+    (0.2126729, 0.7151522, 0.0721750),
+    (0.0193339, 0.1191920, 0.9503041)), dtype=np.float64)
+
+_D65_WHITE = np.array((0.95047, 1.0, 1.08883), dtype=np.float64)
+
+
+def linear_to_lab(rgb):
+    '''Convert an (N, 3) linear rgb array to CIELAB (D65)'''
+    rgb = np.clip(np.asarray(rgb, dtype=np.float64).reshape(-1, 3), 0.0, None)
+    xyz = rgb @ _RGB_TO_XYZ.T / _D65_WHITE
+    delta = 6 / 29
+    f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[:, 0] = 116 * f[:, 1] - 16
+    lab[:, 1] = 500 * (f[:, 0] - f[:, 1])
+    lab[:, 2] = 200 * (f[:, 1] - f[:, 2])
+    return lab
+
+
+def ciede2000(lab1, lab2):
+    '''Vectorized CIEDE2000 color difference between two broadcastable (..., 3) Lab arrays'''
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_mean7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_mean7 / (C_mean7 + 25 ** 7)))
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    chroma_zero = (C1p * C2p) == 0
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(chroma_zero, 0, dh)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dh / 2))
+
+    Lp_mean = (L1 + L2) / 2
+    Cp_mean = (C1p + C2p) / 2
+    h_sum = h1p + h2p
+    hp_mean = np.where(np.abs(h1p - h2p) > 180,
+                       np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2),
+                       h_sum / 2)
+    hp_mean = np.where(chroma_zero, h_sum, hp_mean)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_mean - 30))
+         + 0.24 * np.cos(np.radians(2 * hp_mean))
+         + 0.32 * np.cos(np.radians(3 * hp_mean + 6))
+         - 0.20 * np.cos(np.radians(4 * hp_mean - 63)))
+    d_theta = 30 * np.exp(-(((hp_mean - 275) / 25) ** 2))
+    Cp_mean7 = Cp_mean ** 7
+    R_C = 2 * np.sqrt(Cp_mean7 / (Cp_mean7 + 25 ** 7))
+    S_L = 1 + (0.015 * (Lp_mean - 50) ** 2) / np.sqrt(20 + (Lp_mean - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_mean
+    S_H = 1 + 0.015 * Cp_mean * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    return np.sqrt((dLp / S_L) ** 2 + (dCp / S_C) ** 2 + (dHp / S_H) ** 2
+                   + R_T * (dCp / S_C) * (dHp / S_H))
+
+
+class LabGrid:
+    '''Uniform grid spatial index over Lab points
+
+    Cell size is chosen from palette extent so each cell holds a few entries,
+    so a query only looks at a handful of cells whatever the palette size.
+    Queries far from the palette (needing too many cells to be visited)
+    fall back to a brute force scan, so a query never cost much more than comparing every entry.
+    '''
+
+    # average number of palette entries per cell
+    occupancy = 4
+
+    # min extent of an axis relative to the largest one
+    # (a flat palette, like a grayscale one, would else get a tiny cell size and a huge grid)
+    min_extent_ratio = 0.125
+
+    # a query visiting more cells than this fraction of the palette size switch to a brute force scan
+    # (cells are visited in python, entries are compared in one vectorized call)
+    max_cells_ratio = 1 / 32
+
+    def __init__(self, lab):
+        self.lab = np.asarray(lab, dtype=np.float64)
+        self.mins = self.lab.min(axis=0)
+        extent = np.maximum(self.lab.max(axis=0) - self.mins, 1e-3)
+        extent = np.maximum(extent, extent.max() * self.min_extent_ratio)
+        cells = max(1.0, len(self.lab) / self.occupancy)
+        self.cell = max(float(np.cbrt(np.prod(extent) / cells)), 1e-3)
+        self.dims = (extent // self.cell).astype(np.int64) + 1
+
+        coords = self._cell_coords(self.lab)
+        keys = self._keys(coords)
+        self.order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self.order]
+        all_keys = np.arange(int(np.prod(self.dims)))
+        self.starts = np.searchsorted(sorted_keys, all_keys, side='left')
+        self.ends = np.searchsorted(sorted_keys, all_keys, side='right')
+        self._rings = {}
+        self.max_cells = max(27, len(self.lab) * self.max_cells_ratio)
+        self.comparisons = 0 # number of entry distances computed by queries
+
+    def _cell_coords(self, lab):
+        return np.floor((lab - self.mins) / self.cell).astype(np.int64)
+
+    def _keys(self, coords):
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    def _ring_offsets(self, r):
+        '''Offsets of the cells at chebyshev distance r'''
+        offsets = self._rings.get(r)
+        if offsets is None:
+            span = np.arange(-r, r + 1)
+            offsets = np.stack(np.meshgrid(span, span, span, indexing='ij'), axis=-1).reshape(-1, 3)
+            offsets = offsets[np.abs(offsets).max(axis=1) == r]
+            self._rings[r] = offsets
+        return offsets
+
+    def candidates(self, lab, count):
+        '''Return indices of (at least) the `count` nearest entries (euclidean Lab distance, i.e. deltaE 76)
+        and their distances, sorted by distance
+        '''
+        lab = np.asarray(lab, dtype=np.float64)
+        # query outside palette extent (hdr colors...) start from nearest cell of the grid,
+        # entries r rings away from it are still at least r cells away from the query
+        origin = np.clip(self._cell_coords(lab), 0, self.dims - 1)
+        count = min(count, len(self.lab))
+        max_ring = int(np.maximum(origin, self.dims - 1 - origin).max())
+
+        found = []
+        total = 0
+        for r in range(max_ring + 1):
+            if (2 * r + 1) ** 3 > self.max_cells:
+                # far from every entry, scan them all
+                return self._brute_force(lab, count)
+            cells = origin + self._ring_offsets(r)
+            cells = cells[((cells >= 0) & (cells < self.dims)).all(axis=1)]
+            if len(cells):
+                keys = self._keys(cells)
+                starts, ends = self.starts[keys], self.ends[keys]
+                filled = ends > starts
+                for start, end in zip(starts[filled], ends[filled]):
+                    found.append(self.order[start:end])
+                    total += end - start
+
+            if total < count:
+                continue
+            idx = np.concatenate(found)
+            dist = np.sqrt(((self.lab[idx] - lab) ** 2).sum(axis=1))
+            self.comparisons += len(idx)
+            # entries in unvisited cells are at least r cells away
+            kth = np.partition(dist, count - 1)[count - 1]
+            if kth <= r * self.cell or r == max_ring:
+                best = np.argsort(dist, kind='stable')[:count]
+                return idx[best], dist[best]
+            if (2 * int(np.ceil(kth / self.cell)) + 1) ** 3 > self.max_cells:
+                # rings left to confirm the result cover more cells than there are entries
+                return self._brute_force(lab, count)
+
+        return self._brute_force(lab, count)
+
+    def _brute_force(self, lab, count):
+        dist = np.sqrt(((self.lab - lab) ** 2).sum(axis=1))
+        self.comparisons += len(dist)
+        if count < len(dist):
+            # ties at the count-th distance included, so the stable sort keep database order
+            best = np.flatnonzero(dist <= np.partition(dist, count - 1)[count - 1])
+        else:
+            best = np.arange(len(dist))
+        best = best[np.argsort(dist[best], kind='stable')[:count]]
+        return best, dist[best]
+
+
+class ColorPalette:
+    '''Named colors stored as an (N, 3) linear rgb float32 array'''
+
+    # max number of query/palette distances computed at once (bound memory usage)
+    chunk_size = 2 ** 22
+
+    def __init__(self, names, colors):
+        self.names = list(names)
+        self.colors = np.asanyarray(colors, dtype=np.float32).reshape(-1, 3) # keep memmap
+        if len(self.names) != len(self.colors):
+            raise ValueError(f'{len(self.names)} names for {len(self.colors)} colors')
+        self._lab = None
+        self._grid = None
+        self.comparisons = 0 # number of color distances computed by queries (profiling)
+
+    @classmethod
+    def from_dict(cls, color_dict):
+        '''Build palette from a {"name": "#hexcode"} dict'''
+        return cls(color_dict.keys(), srgb_to_linear(parse_hex(color_dict.values())))
+
+    def __len__(self):
+        return len(self.names)
+
+    metrics = metrics
+
+    # number of nearest Lab candidates re-ranked with deltaE 2000
+    ciede2000_candidates = 16
+
+    @property
+    def lab(self):
+        if self._lab is None:
+            self._lab = linear_to_lab(self.colors)
+        return self._lab
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            self._grid = LabGrid(self.lab)
+        return self._grid
+
+    def nearest_indices(self, colors, metric='RGB'):
+        '''Return index of the nearest palette entry for each rgb[a] color of the passed (N, 3|4) array
+        :metric: in 'RGB', 'LAB', 'CIEDE2000' (see ColorPalette.metrics)
+        With 'RGB', ties are resolved by database order (first entry wins).
+        'CIEDE2000' re-ranks the nearest Lab entries only, which can rarely
+        miss the exact deltaE 2000 minimum on very dense palettes.
+        '''
+        colors = np.asarray(colors, dtype=np.float32)
+        if colors.ndim == 1:
+            colors = colors[None, :]
+        colors = colors[:, :3]
+
+        if metric == 'RGB':
+            result = np.empty(len(colors), dtype=np.int64)
+            step = max(1, self.chunk_size // max(1, len(self.colors)))
+            for start in range(0, len(colors), step):
+                block = colors[start:start + step]
+                dist = ((block[:, None, :] - self.colors[None, :, :]) ** 2).sum(axis=2)
+                result[start:start + step] = dist.argmin(axis=1)
+            self.comparisons += len(colors) * len(self.colors)
+            return result
+
+        if metric not in ('LAB', 'CIEDE2000'):
+            raise ValueError(f'Unknown color metric: {metric}')
+
+        grid = self.grid
+        start_ct = grid.comparisons
+        result = np.empty(len(colors), dtype=np.int64)
+        for i, lab in enumerate(linear_to_lab(colors)):
+            if metric == 'LAB':
+                idx, _dist = grid.candidates(lab, 1)
+                result[i] = idx[0]
+                continue
+            # deltaE 2000 only evaluated on the nearest Lab candidates
+            idx, _dist = grid.candidates(lab, self.ciede2000_candidates)
+            result[i] = idx[np.argmin(ciede2000(lab, self.lab[idx]))]
+            self.comparisons += len(idx)
+        self.comparisons += grid.comparisons - start_ct
+        return result
+
+    def ranked_indices(self, color, count, metric='RGB'):
+        '''Return indices of the `count` nearest palette entries of a single rgb[a] color, nearest first'''
+        color = np.asarray(color, dtype=np.float32).reshape(-1)[:3]
+        count = min(count, len(self.colors))
+        if metric == 'RGB':
+            dist = ((self.colors - color) ** 2).sum(axis=1)
+            self.comparisons += len(dist)
+            return np.argsort(dist, kind='stable')[:count]
+        if metric not in ('LAB', 'CIEDE2000'):
+            raise ValueError(f'Unknown color metric: {metric}')
+
+        lab = linear_to_lab(color[None, :])[0]
+        grid = self.grid
+        start_ct = grid.comparisons
+        idx, _dist = grid.candidates(lab, count if metric == 'LAB' else max(count, self.ciede2000_candidates))
+        self.comparisons += grid.comparisons - start_ct
+        if metric == 'LAB':
+            return idx
+        self.comparisons += len(idx)
+        return idx[np.argsort(ciede2000(lab, self.lab[idx]), kind='stable')[:count]]
+
+    def ranked_names(self, color, count, metric='RGB'):
+        '''Return names of the `count` nearest palette entries of a single rgb[a] color, nearest first'''
+        return [self.names[i] for i in self.ranked_indices(color, count, metric=metric)]
+
+    def nearest(self, colors, metric='RGB'):
+        '''Return nearest color name for each rgb[a] color of the passed list'''
+        if not len(colors):
+            return []
+        return [self.names[i] for i in self.nearest_indices(colors, metric=metric)]
+
+
+def read_json(fp) -> ColorPalette:
+    '''Parse a json color database ({"name": "#hexcode"}) and return a ColorPalette'''
+    import json
+    with open(fp) as fd:
+        return ColorPalette.from_dict(json.load(fd))
+
+
+def load_file(fp) -> ColorPalette:
+    '''Load json database from its compiled file when up to date (no session cache)'''
+    return load_compiled_or_json(fp, read_json)
+
+
+## --- Compiled palette
+
+# Binary layout (little endian):
+# 8 bytes magic, uint32 entry count, uint32 names blob size,
+# int64 source json mtime (ns), uint64 source json size,
+# float32 (count, 3) linear rgb, utf-8 names separated by null bytes
+COMPILED_MAGIC = b'AMPAL\x00\x02\x00'
+# (magic is raw bytes: an 'S8' field would drop its trailing null byte)
+COMPILED_HEADER = np.dtype([('magic', 'V8'), ('count', '<u4'), ('names_size', '<u4'),
+                            ('source_mtime_ns', '<i8'), ('source_size', '<u8')])
+COMPILED_SUFFIX = '.ampal'
+
+
+def compiled_path(fp):
+    '''Return path of the compiled palette associated with a json database'''
+    from pathlib import Path
+    return Path(fp).with_suffix(COMPILED_SUFFIX)
+
+
+def write_compiled(fp, palette, source=(0, 0)):
+    '''Write palette in compiled binary format at fp (atomic replace)
+    :source: (mtime_ns, size) of the json database it was built from
+    '''
+    import os
+    names = '\0'.join(palette.names).encode('utf-8')
+    header = np.array([(COMPILED_MAGIC, len(palette), len(names), *source)], dtype=COMPILED_HEADER)
+    tmp = f'{fp}.tmp{os.getpid()}'
+    try:
+        with open(tmp, 'wb') as fd:
+            fd.write(header.tobytes())
+            fd.write(np.ascontiguousarray(palette.colors, dtype='<f4').tobytes())
+            fd.write(names)
+        os.replace(tmp, fp)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_compiled(fp, source=None):
+    '''Return ColorPalette from a compiled file, colors are memory-mapped (not read upfront)
+    :source: if passed, (mtime_ns, size) of the json database, ValueError is raised if the file was built from another version
+    '''
+    header = np.fromfile(fp, dtype=COMPILED_HEADER, count=1)
+    if not len(header) or header['magic'][0].tobytes() != COMPILED_MAGIC:
+        raise ValueError(f'Not a compiled palette: {fp}')
+    if source is not None and (int(header['source_mtime_ns'][0]), int(header['source_size'][0])) != tuple(source):
+        raise ValueError(f'Compiled palette is outdated: {fp}')
+    count = int(header['count'][0])
+    names_size = int(header['names_size'][0])
+    colors = np.memmap(fp, dtype='<f4', mode='r', offset=COMPILED_HEADER.itemsize, shape=(count, 3))
+    with open(fp, 'rb') as fd:
+        fd.seek(COMPILED_HEADER.itemsize + colors.nbytes)
+        names = fd.read(names_size).decode('utf-8')
+    names = names.split('\0') if count else []
+    return ColorPalette(names, colors)
+
+
+def load_compiled_or_json(fp, json_loader):
+    '''Load palette from compiled file next to json database at fp if up to date,
+    else parse json with json_loader and (try to) write the compiled file for next time
+    '''
+    import os
+    compiled = compiled_path(fp)
+    # compiled file records the json version it was built from (a database swapped
+    # with an older modification time than the compiled file must still be rebuilt)
+    stat = os.stat(fp)
+    source = (stat.st_mtime_ns, stat.st_size)
+    try:
+        return read_compiled(compiled, source=source)
+    except (OSError, ValueError):
+        pass
+
+    palette = json_loader(fp)
+    try:
+        write_compiled(compiled, palette, source=source)
+    except OSError as e:
+        # read-only addon folder, file locked... just use json every time
+        print(f'Could not write compiled palette {compiled}: {e}')
+    return palette
+
+
+## --- Session registry
+
+# resolved filepath -> (mtime_ns, size, ColorPalette)
+_registry = {}
+
+
+def load_palette(fp, loader):
+    '''Return palette for database at fp, parsed only once per session
+    :loader: function called with the filepath to build the ColorPalette
+    Reloaded only when file modification time or size changed.
+    '''
+    import os
+    fp = os.path.realpath(fp)
+    stat = os.stat(fp)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _registry.get(fp)
+    if cached and cached[:2] == key:
+        return cached[2]
+
+    palette = loader(fp)
+    _registry[fp] = (*key, palette)
+    return palette
+
+
+def clear_registry():
+    '''Forget every loaded palette'''
+    _registry.clear()
@@ -0,0 +1,93 @@
+'''Fan out color naming and signature hashing to a process pool.
+
+Only meant for bpy-free entry points (benchmarks, scripts) where this package
+is imported as the top-level `core` package: workers are started with 'spawn'
+and import it the same way, so they never import the addon itself, nor bpy.
+Imported from the addon package (inside Blender), or when the work is too small
+to pay the process startup, the computation runs serially in the current process
+(sys.path is never modified).
+'''
+
+import os
+import sys
+
+import numpy as np
+
+from . import palette as _palette
+from . import signature as _signature
+
+
+# below this number of items, serial is faster than starting processes
+min_parallel_items = 2048
+
+_worker_palette = None
+
+
+def _init_palette(names, colors):
+    global _worker_palette
+    _worker_palette = _palette.ColorPalette(names, colors)
+
+
+def _name_chunk(colors, metric):
+    return _worker_palette.nearest_indices(colors, metric=metric)
+
+
+def _hash_chunk(records, tolerance):
+    return [_signature.signature_hash(r, tolerance) for r in records]
+
+
+def worker_module():
+    '''Return this module if imported as top-level `core.parallel` (picklable in spawned workers) else None'''
+    if __name__ == 'core.parallel':
+        return sys.modules[__name__]
+    return None
+
+
+def get_workers(workers=None):
+    '''Resolve number of worker processes, 0 or None means number of cpu'''
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def _executor(workers, initializer=None, initargs=()):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=initializer, initargs=initargs)
+
+
+def _chunks(items, count):
+    size = -(-len(items) // count)
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+
+def nearest_indices(palette: _palette.ColorPalette, colors, metric: str = 'RGB', workers: int = None) -> np.ndarray:
+    '''Same as palette.nearest_indices, split over worker processes for large color lists'''
+    colors = np.asarray(colors, dtype=np.float32)
+    workers = get_workers(workers)
+    module = worker_module() if workers > 1 and len(colors) >= min_parallel_items else None
+    if module is None:
+        return palette.nearest_indices(colors, metric=metric)
+
+    with _executor(workers, module._init_palette, (palette.names, np.array(palette.colors))) as pool:
+        futures = [pool.submit(module._name_chunk, chunk, metric) for chunk in _chunks(colors, workers)]
+        return np.concatenate([f.result() for f in futures])
+
+
+def nearest(palette: _palette.ColorPalette, colors, metric: str = 'RGB', workers: int = None) -> list:
+    '''Return nearest color name for each color, split over worker processes for large color lists'''
+    if not len(colors):
+        return []
+    return [palette.names[i] for i in nearest_indices(palette, colors, metric=metric, workers=workers)]
+
+
+def signature_hashes(records, tolerance: float = 1e-4, workers: int = None) -> list:
+    '''Return signature_hash of each record, split over worker processes for large record lists'''
+    records = list(records)
+    workers = get_workers(workers)
+    module = worker_module() if workers > 1 and len(records) >= min_parallel_items else None
+    if module is None:
+        return _hash_chunk(records, tolerance)
+
+    with _executor(workers) as pool:
+        futures = [pool.submit(module._hash_chunk, chunk, tolerance) for chunk in _chunks(records, workers)]
+        return [h for f in futures for h in f.result()]
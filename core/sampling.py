@@ -0,0 +1,77 @@
+'''Representative color of a pixel buffer.
+
+Dominant color is found with a k-means clustering of a bounded number of pixels,
+fully vectorized, with a fixed iteration cap and seeded initialization:
+cost doesn't depend on image resolution and the same pixels always give the same color.
+
+This module does not import bpy.
+'''
+
+import numpy as np
+
+# max pixels clustered (pixels are taken on a regular grid above that)
+max_samples = 16384
+
+# pixels with a lower alpha are ignored (unless the whole image is transparent)
+min_alpha = 0.5
+
+
+def grid_samples(pixels, count=max_samples):
+    '''Return (n, channels) pixels taken on a regular grid of (height, width, channels) pixels, n <= count'''
+    height, width = pixels.shape[:2]
+    step = max(1, int(np.ceil(np.sqrt(height * width / count))))
+    return pixels[::step, ::step].reshape(-1, pixels.shape[2])
+
+
+def _init_centers(samples, clusters, rng):
+    '''k-means++ initialization: centers spread over the samples'''
+    centers = np.empty((clusters, samples.shape[1]), dtype=samples.dtype)
+    centers[0] = samples[rng.integers(len(samples))]
+    dist = ((samples - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, clusters):
+        total = dist.sum()
+        if total <= 0:
+            # less distinct colors than clusters
+            return centers[:i]
+        centers[i] = samples[rng.choice(len(samples), p=dist / total)]
+        dist = np.minimum(dist, ((samples - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+
+def kmeans(samples, clusters=5, iterations=12, seed=0, tolerance=1e-5):
+    '''Cluster (n, 3) samples, return (centers, sizes) sorted by decreasing cluster size'''
+    samples = np.asarray(samples, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(samples, min(clusters, len(samples)), rng)
+
+    for _ in range(iterations):
+        # squared distances (n, k) without building a (n, k, 3) array
+        dist = (samples ** 2).sum(axis=1)[:, None] - 2 * samples @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+        labels = dist.argmin(axis=1)
+        sizes = np.bincount(labels, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=samples[:, c], minlength=len(centers)) for c in range(samples.shape[1])], axis=1)
+        filled = sizes > 0
+        updated = centers.copy()
+        updated[filled] = sums[filled] / sizes[filled, None]
+        shift = np.abs(updated - centers).max()
+        centers = updated
+        if shift < tolerance:
+            break
+
+    dist = (samples ** 2).sum(axis=1)[:, None] - 2 * samples @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    sizes = np.bincount(dist.argmin(axis=1), minlength=len(centers))
+    order = np.argsort(-sizes, kind='stable')
+    return centers[order], sizes[order]
+
+
+def dominant_color(pixels, clusters=5, iterations=12, seed=0):
+    '''Return rgb color (3 floats) of the biggest cluster of colors in (height, width, channels) pixels'''
+    samples = grid_samples(pixels)
+    if samples.shape[1] == 4:
+        opaque = samples[samples[:, 3] >= min_alpha]
+        if len(opaque):
+            samples = opaque
+    # grayscale images have less than 3 channels
+    rgb = samples[:, :3] if samples.shape[1] >= 3 else np.repeat(samples[:, :1], 3, axis=1)
+    centers, _sizes = kmeans(rgb, clusters=clusters, iterations=iterations, seed=seed)
+    return tuple(float(c) for c in centers[0])
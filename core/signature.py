@@ -0,0 +1,37 @@
+'''Material signature math on plain python values.
+
+Blender adapters (see clean_slots) extract materials and node trees as nested
+tuples of plain values (None, bool, int, float, str), this module compares
+and hashes them. It does not import bpy.
+'''
+
+import hashlib
+
+
+def quantize(value, tolerance: float = 1e-4):
+    '''Return hashable, stable representation of a plain value, floats are quantized to tolerance'''
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return round(value / tolerance)
+    if isinstance(value, (set, frozenset)): # enum flags
+        return tuple(sorted(value))
+    if isinstance(value, (tuple, list)):
+        return tuple(quantize(v, tolerance) for v in value)
+    return repr(value)
+
+
+def values_close(a, b) -> bool:
+    '''Compare plain values, float with same tolerance as numpy.isclose'''
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(values_close(va, vb) for va, vb in zip(a, b))
+    if isinstance(a, float) or isinstance(b, float):
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+            return False
+        return abs(a - b) <= 1e-08 + 1e-05 * abs(b)
+    return a == b
+
+
+def signature_hash(record, tolerance: float = 1e-4) -> str:
+    '''Return a stable hash of a record, two records with same hash are identical (float compared with tolerance)'''
+    return hashlib.blake2b(repr(quantize(record, tolerance)).encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,138 @@
+'''Persistent cache of sampled texture colors, so unchanged textures are never loaded again just to name a color.
+
+Entries are keyed by resolved file path, file size, modification time and sampling settings:
+an edited or replaced texture gets a new key, there is nothing to invalidate.
+They are stored as JSON lines, appended as soon as a color is sampled
+(a crash or a concurrent Blender loses at most its last line). Only the last line
+of a file path and sampling mode is kept (older versions of the file can't match anymore),
+the file is rewritten without these stale lines and entries of deleted files when they pile up.
+
+This module does not import bpy.
+'''
+
+import json
+import os
+
+FILE_NAME = 'texture_colors.jsonl'
+
+# rewrite file on load when it holds more than this ratio of stale or invalid lines
+compact_ratio = 2.0
+
+# also rewrite it above this number of lines (drop entries of deleted files)
+compact_lines = 10000
+
+
+def file_key(path, mode):
+    '''Return cache key of file at path sampled with mode (str), None if file can't be read'''
+    path = os.path.normcase(os.path.realpath(path))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return
+    return (path, stat.st_size, stat.st_mtime_ns, mode)
+
+
+class TextureColorCache:
+    '''Sampled colors of texture files, loaded from fp on first access'''
+
+    def __init__(self, fp):
+        self.fp = fp
+        self._entries = None # key -> rgba tuple
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, color):
+        color = tuple(float(c) for c in color)
+        if self.entries.get(key) == color:
+            return
+        self.entries[key] = color
+        try:
+            os.makedirs(os.path.dirname(self.fp), exist_ok=True)
+            with open(self.fp, 'a', encoding='utf-8') as fd:
+                fd.write(self._line(key, color))
+        except OSError as e:
+            # read-only config folder... cache only live for the session
+            print(f'Could not write texture color cache {self.fp}: {e}')
+
+    def clear(self):
+        '''Forget every entry and delete the file'''
+        self._entries = {}
+        try:
+            os.remove(self.fp)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _line(key, color):
+        path, size, mtime_ns, mode = key
+        return json.dumps({'path': path, 'size': size, 'mtime_ns': mtime_ns, 'mode': mode, 'color': color}) + '\n'
+
+    def _load(self):
+        latest = {} # (path, mode) -> (key, color) of last line
+        lines = 0
+        try:
+            with open(self.fp, encoding='utf-8') as fd:
+                for line in fd:
+                    lines += 1
+                    try:
+                        data = json.loads(line)
+                        key = (data['path'], data['size'], data['mtime_ns'], data['mode'])
+                        latest[(key[0], key[3])] = (key, tuple(float(c) for c in data['color']))
+                    except (ValueError, KeyError, TypeError):
+                        # truncated line of an interrupted write
+                        continue
+        except FileNotFoundError:
+            return {}
+        except OSError as e:
+            print(f'Could not read texture color cache {self.fp}: {e}')
+            return {}
+
+        entries = dict(latest.values())
+        if lines > max(64, len(entries) * compact_ratio) or lines > compact_lines:
+            entries = {key: color for key, color in entries.items() if os.path.exists(key[0])}
+            self._write(entries)
+        return entries
+
+    def _write(self, entries):
+        '''Rewrite file with passed entries only (atomic replace)'''
+        tmp = f'{self.fp}.tmp{os.getpid()}'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as fd:
+                for key, color in entries.items():
+                    fd.write(self._line(key, color))
+            os.replace(tmp, self.fp)
+        except OSError as e:
+            print(f'Could not compact texture color cache {self.fp}: {e}')
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+## --- Session registry
+
+# file path -> TextureColorCache
+_caches = {}
+
+
+def get_cache(fp):
+    '''Return the cache stored at fp, loaded once per session'''
+    fp = os.path.realpath(fp)
+    cache = _caches.get(fp)
+    if cache is None:
+        cache = _caches[fp] = TextureColorCache(fp)
+    return cache
+
+
+def clear_registry():
+    '''Forget loaded caches (files are kept)'''
+    _caches.clear()
@@ -1,4 +1,9 @@
 import bpy
+from . import profiling
+from . import scope
+from .core.colors import hex_to_rgb
+
+# numpy and palette matching modules are imported on first use (keep addon registration light)
 
 def report(*args, self=None, mode='INFO'):
     #mode in 'INFO' (default), 'WARNING', 'ERROR'
@@ -17,148 +22,345 @@ def get_addon_prefs():
 
 ### --- Object Color <-> Material Color 
 
-#-# seem like it's needed to be passed to linear in blender for correct result
-#-# https://blender.stackexchange.com/questions/158896/how-set-hex-in-rgb-node-python/158902
-
-def srgb_to_linearrgb(c):
-    if   c < 0:       return 0
-    elif c < 0.04045: return c/12.92
-    else:             return ((c+0.055)/1.055)**2.4
-
-def hex_to_rgb(h):
-    '''Convert a hexadecimal color value to a 3-tuple of integers
-    suitable for use in an ``rgb()`` triplet specifying that color.
-    '''
-
-    h=int(h[1:], 16)
-    r = (h & 0xff0000) >> 16
-    g = (h & 0x00ff00) >> 8
-    b = (h & 0x0000ff)
-    return tuple([srgb_to_linearrgb(c/0xff) for c in (r,g,b)])
-
-
-def get_color_name(rgb, color_dict):
+def get_color_name(rgb, palette, metric=None):
     '''Get a rgb[a] (tuple/list) or an hex (str)
     return nearest color name found in passed color database
+    (a ColorPalette or a {"name": "#hexcode"} dict)
+    :metric: color distance used, default to addon prefs (see ColorPalette.metrics)
     '''
+    if isinstance(palette, dict):
+        from .core.palette import ColorPalette
+        palette = ColorPalette.from_dict(palette)
+
     if isinstance(rgb, str): # must be an hexa code
-        rgb = rgb if rgb.clip.startswith('#') else '#'+rgb
+        rgb = rgb if rgb.startswith('#') else '#'+rgb
         rgb = hex_to_rgb(rgb)
 
-    min_colours = {}
-    for name, hex in color_dict.items():
-        r_c, g_c, b_c = hex_to_rgb(hex)#.strip('#')
-        rd = (r_c - rgb[0]) ** 2
-        gd = (g_c - rgb[1]) ** 2
-        bd = (b_c - rgb[2]) ** 2
-        min_colours[(rd + gd + bd)] = name
-    closest_name = min_colours[min(min_colours.keys())]
+    return get_color_names([rgb], palette, metric=metric)[0]
+
+def get_color_names(colors, palette, metric=None):
+    '''Get a list of rgb[a] colors, return list of nearest color names (single vectorized lookup)'''
+    if isinstance(palette, dict):
+        from .core.palette import ColorPalette
+        palette = ColorPalette.from_dict(palette)
+    if metric is None:
+        metric = get_addon_prefs().match_metric
+    prof = profiling.current
+    start_ct = palette.comparisons
+    with prof.stage('palette_matching'):
+        names = palette.nearest(colors, metric=metric)
+    prof.count('palette_queries', len(colors))
+    # distances actually computed (grid based metrics only compare a few candidates, unless falling back to a full scan)
+    prof.count('palette_comparisons', palette.comparisons - start_ct)
+    return names
+
+def get_color_db_path():
+    '''Return path of the color database shipped in addon folder'''
+    import os
+    from pathlib import Path
+    return Path(os.path.realpath(__file__)).parent / 'colornames.json'
 
-    return closest_name
+def read_color_dic(fp):
+    '''Return ColorPalette of a json database, from its compiled file when up to date'''
+    from .core import palette
+    return palette.load_file(fp)
 
-def load_color_dic(fp):
-    import json
-    from pathlib import Path
-    color_dict = None
-    color_db = Path(fp)
-    with color_db.open() as fd:
-        color_dict = json.load(fd)
-    return color_dict
+def load_color_dic(fp=None):
+    '''Return ColorPalette of passed json database (default to addon colornames.json)
+    Parsed once per session, reloaded only if the file changed on disk
+    A compiled copy (.ampal) is written next to the json and used instead of it afterwards
+    '''
+    from .core import palette
+    if fp is None:
+        fp = get_color_db_path()
+    return palette.load_palette(fp, read_color_dic)
 
 
 
 ### --- Object Color <-> Material Color 
 
 
-def get_single_pixel_color_from_image(img):
+# Texture sampling modes, (identifier, name, description) as used by AM_preferences enum
+sample_modes = (
+    ('CENTER', 'Center', 'Color of the center pixel'),
+    ('MEAN', 'Mean', 'Average color of a grid of pixels spread over the image'),
+    ('MEDIAN', 'Median', 'Median color of a grid of pixels spread over the image (ignore small details)'),
+    ('DOMINANT', 'Dominant', 'Color of the biggest group of similar pixels (k-means clustering, ignore transparent pixels)'),
+)
+
+# max number of samples per axis for MEAN/MEDIAN modes
+sample_grid_size = 128
+
+def get_image_pixels(img, max_size=512):
+    '''Return pixels of passed image as a (height, width, channels) float32 array
+    :max_size: if the image is bigger, pixels are read from a scaled down copy
+    so the returned buffer never exceed max_size on both axis
+    '''
+    import numpy as np
+    width, height = img.size[:]
+    if not width or not height:
+        return
+
+    source = img
+    if max(width, height) > max_size:
+        factor = max_size / max(width, height)
+        source = img.copy()
+        source.scale(max(1, int(width * factor)), max(1, int(height * factor)))
+
+    try:
+        width, height = source.size[:]
+        channels = source.channels
+        pixels = np.empty(width * height * channels, dtype=np.float32)
+        source.pixels.foreach_get(pixels)
+    finally:
+        if source is not img:
+            bpy.data.images.remove(source)
+
+    return pixels.reshape(height, width, channels)
+
+def get_texture_cache():
+    '''Return persistent texture color cache stored in user config folder'''
+    import os
+    from .core import texture_cache
+    return texture_cache.get_cache(os.path.join(bpy.utils.user_resource('CONFIG'), 'auto_material', texture_cache.FILE_NAME))
+
+def image_cache_key(img, mode, max_size):
+    '''Return texture color cache key of image sampled with passed settings
+    None if image has no (unmodified) file on disk: packed, generated, sequence, painted...
     '''
+    if img.source != 'FILE' or img.packed_file or img.is_dirty or not img.filepath:
+        return
+    from .core import texture_cache
+    path = bpy.path.abspath(img.filepath, library=img.library)
+    # color space and alpha mode change the pixels read from the same file
+    settings = f'{mode}:{max_size}:{img.colorspace_settings.name}:{img.alpha_mode}'
+    return texture_cache.file_key(path, settings)
+
+def get_image_color(img, mode='CENTER', max_size=512, cache=None):
+    '''Sample a representative rgba color of a blender image
     :img: A blender type image
-    Sample color of center pixel
+    :mode: sampling mode in 'CENTER', 'MEAN', 'MEDIAN', 'DOMINANT' (see sample_modes)
+    :max_size: maximum sampled resolution (bigger images are sampled on a scaled copy)
+    :cache: optional TextureColorCache, pixels of an unchanged image file are not loaded
+    if its color was already sampled with same settings (in any session)
     '''
-
-    # do a mean of every color (not so usefull...) ?
     if img.type != 'IMAGE':
-        print (f'{img.name}, not an image type >> {img.type}')
         return
 
-    pix_num = len(img.pixels)
-    width = img.size[0]
-    height = img.size[1]
-    
-    target = [width//2, height//2] #sample middle pixel
-    # target = [0,0] # sample first pixel
+    key = None
+    if cache is not None:
+        key = image_cache_key(img, mode, max_size)
+        if key is not None:
+            color = cache.get(key)
+            if color is not None:
+                profiling.current.count('texture_cache_hits')
+                return color
+
+    color = sample_image_color(img, mode=mode, max_size=max_size)
+    if key is not None and color is not None:
+        cache.put(key, color)
+    return color
+
+def sample_image_color(img, mode='CENTER', max_size=512):
+    '''Return rgba color of image sampled from its pixels (see get_image_color)'''
+    import numpy as np
+    with profiling.current.stage('pixel_sampling'):
+        pixels = get_image_pixels(img, max_size=max_size)
+    if pixels is None:
+        return
+    profiling.current.count('pixels_read', pixels.shape[0] * pixels.shape[1])
+
+    height, width = pixels.shape[:2]
+    if mode == 'CENTER':
+        rgb = pixels[height // 2, width // 2, :3]
+    elif mode == 'DOMINANT':
+        from .core import sampling
+        with profiling.current.stage('color_clustering'):
+            rgb = sampling.dominant_color(pixels)
+    else:
+        step_y = max(1, height // sample_grid_size)
+        step_x = max(1, width // sample_grid_size)
+        grid = pixels[::step_y, ::step_x, :3].reshape(-1, 3)
+        if mode == 'MEDIAN':
+            rgb = np.median(grid, axis=0)
+        else:
+            rgb = grid.mean(axis=0)
 
-    index = ( target[1] * width + target[0] ) * img.channels
-    print('index: ', index)
-    
-    rgb = (img.pixels[index],
-    img.pixels[index + 1],
-    img.pixels[index + 2], 1.0)
-    
-    print(rgb)
-    return rgb
+    # grayscale images have less than 3 channels
+    rgb = np.resize(rgb, 3)
+    return (*(float(c) for c in rgb), 1.0)
+
+def get_single_pixel_color_from_image(img):
+    '''
+    :img: A blender type image
+    Sample color of center pixel
+    '''
+    return get_image_color(img, mode='CENTER')
 
 
 color_node_exclude =  ('MIX_RGB', 'TEX_GRADIENT', 'BRIGHTCONTRAST', 'CURVE_RGB', 'VALTORGB')
 
 
-def find_color_up_tree(node):
-    '''Recursive find color in node_tree'''
-    # print(node.type)#Dbg
+# returned when a search inside a node group reach its group input:
+# color has to be searched in inputs of the group node using it
+_GROUP_INPUT = object()
 
-    # Ouputs
-    if node.outputs.get('Color') and node.type not in color_node_exclude:
-        # if has an out (rgb nodes or ramp, etc, take this first)
-        if node.type == 'TEX_IMAGE' and node.image and node.image.type == 'IMAGE':
-            # if is a texture, sample center pixel color and return
-            return get_single_pixel_color_from_image(node.image)
-        return node.outputs['Color'].default_value[:]
+class NodeColorResolver:
+    '''Find color in node trees, climbing from a node toward its inputs
 
-    # Inputs (Try to get colors)
-    colsocket = node.inputs.get('Base Color')
-    if not colsocket:
-        colsocket = node.inputs.get('Color')
- 
-    if colsocket:
-        if colsocket.is_linked:
-            #print('has linked color socket')#Dbg
-            for link in colsocket.links:
-                color = find_color_up_tree(link.from_node)
-                if color:
-                    return color
-        else:
-            #print('unlinked input color socket ', colsocket.default_value[:])#Dbg
-            return colsocket.default_value[:]
- 
-    # else search for a color source in links of all other socket
-    else:
-        for input in node.inputs:
-            if input.is_linked:
-                for link in input.links:
-                    color = find_color_up_tree(link.from_node)
+    Results are memoized per node for the whole pass (a node reached by multiple paths is evaluated once)
+    and per node group datablock (a group shared by many materials is evaluated once).
+    Meant to be created once per operation and reused for every material.
+    '''
+
+    def __init__(self, sample_mode='CENTER', sample_size=512, cache=None):
+        self.sample_mode = sample_mode
+        self.sample_size = sample_size
+        self.cache = cache # persistent TextureColorCache or None
+        self.memo = {} # node pointer -> color
+        self.groups = {} # node group pointer -> color (or _GROUP_INPUT)
+        self.images = {} # image pointer -> sampled color
+        self.in_progress = set()
+        self.nodes_visited = 0 # total evaluated nodes
+
+    @classmethod
+    def from_prefs(cls):
+        prefs = get_addon_prefs()
+        return cls(sample_mode=prefs.texture_sample_mode, sample_size=prefs.texture_sample_size,
+                   cache=get_texture_cache() if prefs.use_texture_cache else None)
+
+    def material_color(self, mat):
+        '''Return color found climbing tree from material active output, None if not found'''
+        if not mat.use_nodes:
+            return
+        out = None
+        for n in mat.node_tree.nodes:
+            if n.type == 'OUTPUT_MATERIAL':
+                out = n
+                break
+        if not out:
+            return
+        if not out.inputs['Surface'].is_linked:
+            return
+
+        start_ct = self.nodes_visited
+        with profiling.current.stage('node_traversal'):
+            color = self.resolve(out)
+        profiling.current.count('nodes_visited', self.nodes_visited - start_ct)
+        if color is _GROUP_INPUT:
+            return
+        return color
+
+    def resolve(self, node):
+        '''Return first color found from node (memoized, cycle safe)'''
+        key = node.as_pointer()
+        if key in self.memo:
+            return self.memo[key]
+        if key in self.in_progress:
+            # cycle, (invalid link loop)
+            return
+
+        self.in_progress.add(key)
+        try:
+            color = self._evaluate(node)
+        finally:
+            self.in_progress.discard(key)
+        self.memo[key] = color
+        return color
+
+    def image_color(self, img):
+        key = img.as_pointer()
+        if key not in self.images:
+            self.images[key] = get_image_color(img, mode=self.sample_mode, max_size=self.sample_size, cache=self.cache)
+        return self.images[key]
+
+    def group_color(self, node):
+        '''Return color found inside node group (evaluated once per group datablock)'''
+        tree = node.node_tree
+        if not tree:
+            return
+        key = tree.as_pointer()
+        if key in self.groups:
+            return self.groups[key]
+
+        self.groups[key] = None # guard against recursive groups
+        out = None
+        for n in tree.nodes:
+            if n.type == 'GROUP_OUTPUT' and n.is_active_output:
+                out = n
+                break
+        color = self.resolve(out) if out else None
+        self.groups[key] = color
+        return color
+
+    def _search_inputs(self, node):
+        colsocket = node.inputs.get('Base Color')
+        if not colsocket:
+            colsocket = node.inputs.get('Color')
+
+        if colsocket:
+            if colsocket.is_linked:
+                for link in colsocket.links:
+                    color = self.resolve(link.from_node)
                     if color:
-                        #print('Color found !', color)
                         return color
- 
-def get_closest_node_color(mat):
+            else:
+                return colsocket.default_value[:]
+
+        # else search for a color source in links of all other socket
+        else:
+            for input in node.inputs:
+                if input.is_linked:
+                    for link in input.links:
+                        color = self.resolve(link.from_node)
+                        if color:
+                            return color
+
+    def _evaluate(self, node):
+        self.nodes_visited += 1
+
+        if node.type == 'GROUP_INPUT':
+            return _GROUP_INPUT
+
+        if node.type == 'GROUP':
+            color = self.group_color(node)
+            if color is not _GROUP_INPUT and color:
+                return color
+            # color come from outside the group (or not found), search group node inputs
+            return self._search_inputs(node)
+
+        # Ouputs
+        if node.outputs.get('Color') and node.type not in color_node_exclude:
+            # if has an out (rgb nodes or ramp, etc, take this first)
+            if node.type == 'TEX_IMAGE' and node.image and node.image.type == 'IMAGE':
+                # if is a texture, sample color and return
+                return self.image_color(node.image)
+            return node.outputs['Color'].default_value[:]
+
+        # Inputs (Try to get colors)
+        return self._search_inputs(node)
+
+
+def find_color_up_tree(node, resolver=None):
+    '''Find color in node_tree climbing up from passed node'''
+    if resolver is None:
+        resolver = NodeColorResolver.from_prefs()
+    color = resolver.resolve(node)
+    if color is _GROUP_INPUT:
+        return
+    return color
+
+def get_closest_node_color(mat, resolver=None):
+    '''Return color found in material node tree (climbing up from output)
+    :resolver: NodeColorResolver to share between multiple materials (created if not passed)
+    '''
     if not mat.use_nodes:
         print('material is not node based')
         return
-    #get output node
-    nodes = mat.node_tree.nodes
-    out = None
-    for n in nodes:
-        if n.type == 'OUTPUT_MATERIAL':
-            out = n
-            break
-    if not out:
-        return
- 
-    if not out.inputs['Surface'].is_linked:
-        return
- 
+    if resolver is None:
+        resolver = NodeColorResolver.from_prefs()
     #go up in the tree until color found (get the 'last' color found ? or color of first node ?)
-    return find_color_up_tree(out)
+    return resolver.material_color(mat)
 
 """# old selection scope
 def material_selection_scope():
@@ -184,46 +386,83 @@ def material_selection_scope():
             print('no active object')
 """
 
-def material_selection_scope():
-    '''Return a list of all material to change'''
-    scene = bpy.context.scene
-    
-    prefs = get_addon_prefs()
-    matlist=[]
-
-    # On active and selected objects
-    active = bpy.context.object
-    pool = [o for o in bpy.context.selected_objects]
-    if active and active not in pool:
-        pool = [active] + pool
-
-    for ob in pool:
-        if scene.mat_change_multiple:
-            for slot in ob.material_slots:
-                mat = slot.material
-                if mat and mat not in matlist:
-                    # filter to only affect unnamed material
-                    if prefs.only_unnamed and not mat.name.startswith('Material'):
-                        continue
-                    matlist.append(mat)
-        else:
-            mat = ob.active_material
-            if mat and mat not in matlist:
-                matlist.append(mat)
-
-    return matlist
-
+def material_selection_scope(context=None):
+    '''Return a list of all material to change (unique, in scope order)
+    Scope is set by scene.mat_scope, all slots or only active one by scene.mat_change_multiple
+    '''
+    context = context or bpy.context
+    scene = context.scene
+    all_slots = scene.mat_change_multiple
+    mat_filter = None
+    # filter to only affect unnamed material
+    if all_slots and get_addon_prefs().only_unnamed:
+        mat_filter = lambda mat: mat.name.startswith('Material')
+    return scope.get_materials(scene.mat_scope, all_slots=all_slots, context=context, filter=mat_filter)
+
+
+## --- Bulk diffuse color access (one foreach call for the whole materials collection)
+
+def material_indices(materials):
+    '''Return array of passed materials index in bpy.data.materials'''
+    import numpy as np
+    lut = {m.as_pointer(): i for i, m in enumerate(bpy.data.materials)}
+    return np.fromiter((lut[m.as_pointer()] for m in materials), dtype=np.int64, count=len(materials))
+
+def get_diffuse_colors():
+    '''Return (N, 4) float32 array of every material diffuse_color (bpy.data.materials order)'''
+    import numpy as np
+    colors = np.empty(len(bpy.data.materials) * 4, dtype=np.float32)
+    bpy.data.materials.foreach_get('diffuse_color', colors)
+    return colors.reshape(-1, 4)
+
+def set_diffuse_colors(colors):
+    '''Write (N, 4) array of every material diffuse_color (bpy.data.materials order)'''
+    bpy.data.materials.foreach_set('diffuse_color', colors.ravel())
+
+def _report_missing(names, message, self=None):
+    if not names:
+        return
+    print(f'{message}:\n  ' + '\n  '.join(names))
+    report(f'{message} ({len(names)} materials, list in console)', self=self, mode='WARNING')
 
 def match_color_viewport_from_node(variables={}):
+    '''Set viewport color of scope materials from their node tree color
+    Colors are read and written for all materials at once, then a single summary is reported
+    '''
+    import numpy as np
     self = variables.get('self')
-    for mat in material_selection_scope():
-        color = get_closest_node_color(mat)
+    matlist = material_selection_scope()
+    resolver = NodeColorResolver.from_prefs()
 
-        if color:
-            # print("color", color)#Dbg
-            mat.diffuse_color = color[:]#-1
-        else:
-            report('cant find color in the node tree...', self=self, mode='ERROR')
+    new_colors = np.empty((len(matlist), 4), dtype=np.float32)
+    found = np.zeros(len(matlist), dtype=bool)
+    missing = []
+    for i, mat in enumerate(matlist):
+        color = get_closest_node_color(mat, resolver=resolver)
+        if not color:
+            missing.append(mat.name)
+            continue
+        new_colors[i] = (*color[:3], color[3] if len(color) > 3 else 1.0)
+        found[i] = True
+
+    prof = profiling.current
+    with prof.stage('color_writing'):
+        colors = get_diffuse_colors()
+        indices = material_indices(matlist)[found]
+        new_colors = new_colors[found]
+        changed = np.abs(colors[indices] - new_colors).max(axis=1, initial=0) > 1e-6
+        if changed.any():
+            colors[indices] = new_colors
+            set_diffuse_colors(colors)
+            # foreach_set doesn't run property update, tag changed materials for viewport redraw
+            for mat, is_changed in zip((m for m, f in zip(matlist, found) if f), changed):
+                if is_changed:
+                    mat.update_tag()
+    updated = int(changed.sum())
+    prof.count('materials_synced', updated)
+
+    _report_missing(missing, 'No color found in node tree', self=self)
+    report(f'{updated} viewport colors updated, {len(changed) - updated} already matching', self=self)
 
 
 def set_closest_node_color(mat, color):
@@ -253,17 +492,22 @@ def set_closest_node_color(mat, color):
         return node
 
 def match_color_node_from_viewport(variables={}):
+    '''Set node color of scope materials from their viewport color (viewport colors read at once)'''
     self = variables.get('self')
     matlist = material_selection_scope()
-    for i, mat in enumerate(matlist):
-        # print( mat.name, i, '/', len(matlist) )
-        color = mat.diffuse_color
-        if color:
-            color = list(color[:-1]) + [1.0]
-            # print("color", color)#Dbg
-            node = set_closest_node_color(mat,color)
+    colors = get_diffuse_colors()[material_indices(matlist)]
+    colors[:, 3] = 1.0
+
+    missing = []
+    changed = 0
+    with profiling.current.stage('color_writing'):
+        for mat, color in zip(matlist, colors.tolist()):
+            node = set_closest_node_color(mat, color)
             if not node:
-                report('cant find a node to set color in the node tree... (this try only with the first node connected to "Surface")', self=self, mode='ERROR')
+                missing.append(mat.name)
                 continue
-            report('color changed in node', node.name, self=self)
-            #return True
\ No newline at end of file
+            changed += 1
+    profiling.current.count('materials_synced', changed)
+
+    _report_missing(missing, 'No node to set color in the node tree (only first node connected to "Surface" is tried)', self=self)
+    report(f'{changed} node colors updated from viewport', self=self)
@@ -0,0 +1,110 @@
+'''Live viewport color sync: keep diffuse_color matched to node tree color while editing
+
+Opt-in (addon preferences). Edited materials are collected by the 'live_sync' tracker channel,
+a timer waits until edits stop for `live_sync_delay` (slider drags don't resolve on every tick),
+then resolves dirty materials within a time budget per tick, rescheduling itself for the rest.
+Only edited materials are resolved, or the ones using node groups when a shader node group changed.
+'''
+
+import time
+
+import bpy
+
+from . import fn
+from . import tracker
+
+CHANNEL = 'live_sync'
+
+# time of last edit, used to debounce
+_last_edit = 0.0
+
+# interval between ticks while a backlog remains (let the UI redraw in between)
+backlog_interval = 0.01
+
+# sampled texture colors shared by the ticks of a backlog (image pointer -> color), cleared on edit
+_images = {}
+
+
+def _on_edit():
+    '''tracker callback: delay resolve until edits stop'''
+    global _last_edit
+    _last_edit = time.perf_counter()
+    _images.clear()
+    if not bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.register(_tick, first_interval=fn.get_addon_prefs().live_sync_delay)
+
+
+def _syncable(mat):
+    return not mat.is_grease_pencil and mat.use_nodes and mat.node_tree
+
+
+def _uses_group(mat):
+    return any(n.type == 'GROUP' for n in mat.node_tree.nodes)
+
+
+def _tick():
+    channel = tracker.get(CHANNEL)
+    if channel is None:
+        return None
+
+    prefs = fn.get_addon_prefs()
+    quiet = time.perf_counter() - _last_edit
+    if quiet < prefs.live_sync_delay:
+        # still editing, wait for the remaining delay
+        return prefs.live_sync_delay - quiet
+
+    if channel.full:
+        # a shader node group changed (tracker doesn't tell which one),
+        # only materials using node groups can be affected
+        channel.full = False
+        for mat in bpy.data.materials:
+            if _syncable(mat) and not mat.library and _uses_group(mat):
+                channel.mark(mat)
+
+    budget = prefs.live_sync_budget / 1000
+    start = time.perf_counter()
+    resolver = fn.NodeColorResolver.from_prefs()
+    # a backlog spread over many ticks sample each texture once
+    resolver.images = _images
+    while channel.dirty:
+        for mat in channel.pop(1):
+            if not _syncable(mat) or mat.library:
+                continue
+            color = fn.get_closest_node_color(mat, resolver=resolver)
+            if not color:
+                continue
+            color = (*color[:3], color[3] if len(color) > 3 else 1.0)
+            # compare before writing, writing trigger a depsgraph update (mark material dirty again)
+            if any(abs(a - b) > 1e-6 for a, b in zip(mat.diffuse_color, color)):
+                mat.diffuse_color = color
+        if time.perf_counter() - start > budget:
+            return backlog_interval
+    _images.clear()
+    return None
+
+
+def enable():
+    tracker.subscribe(CHANNEL, callback=_on_edit)
+
+
+def disable():
+    tracker.unsubscribe(CHANNEL)
+    if bpy.app.timers.is_registered(_tick):
+        bpy.app.timers.unregister(_tick)
+
+
+def update_live_sync(self, context):
+    '''AM_preferences.use_live_viewport_sync update'''
+    if self.use_live_viewport_sync:
+        enable()
+    else:
+        disable()
+
+
+def register():
+    if fn.get_addon_prefs().use_live_viewport_sync:
+        enable()
+
+
+def unregister():
+    disable()
@@ -0,0 +1,209 @@
+'''Material slots compaction without bpy.ops
+
+Material indices of the whole data are read once with foreach_get,
+remapped with a numpy lookup table and written back with foreach_set,
+and the material list is rebuilt in a single step.
+'''
+
+import bpy
+import numpy as np
+
+from . import profiling
+
+
+def build_slot_lut(materials, fuse=True, remove_empty=False):
+    '''Compute new slot list and index lookup table
+    :materials: material of each slot (None for empty slot)
+    :fuse: slots using a material already used by a previous slot point to this first slot
+    :remove_empty: remove slots without material (their indices go to previous kept slot)
+    Return (kept materials, lut) where lut[old_index] = new_index
+    '''
+    kept = []
+    lut = np.zeros(max(1, len(materials)), dtype=np.int32)
+    first = {}
+    for i, mat in enumerate(materials):
+        if mat is None:
+            if remove_empty:
+                lut[i] = max(len(kept) - 1, 0)
+                continue
+        elif fuse:
+            key = mat.as_pointer()
+            if key in first:
+                lut[i] = first[key]
+                continue
+            first[key] = len(kept)
+        lut[i] = len(kept)
+        kept.append(mat)
+    return kept, lut
+
+
+def _gp_index_arrays(gpd):
+    '''Yield (strokes collection, material_index array) for every frame of GP data'''
+    for layer in gpd.layers:
+        for frame in layer.frames:
+            strokes = frame.strokes
+            indices = np.empty(len(strokes), dtype=np.int32)
+            strokes.foreach_get('material_index', indices)
+            yield (strokes, indices)
+
+
+def _mesh_index_arrays(mesh):
+    '''Return material_index array of all mesh polygons'''
+    polygons = mesh.polygons
+    indices = np.empty(len(polygons), dtype=np.int32)
+    polygons.foreach_get('material_index', indices)
+    return [(polygons, indices)]
+
+
+def _curve_index_arrays(curve):
+    '''Return material_index array of curve splines (or text characters)'''
+    if isinstance(curve, bpy.types.TextCurve):
+        elements = curve.body_format
+    else:
+        elements = curve.splines
+    indices = np.empty(len(elements), dtype=np.int32)
+    elements.foreach_get('material_index', indices)
+    return [(elements, indices)]
+
+
+def rewritten_label(data):
+    '''Name of the elements holding material indices in data (used in profiling counters)'''
+    if isinstance(data, bpy.types.GreasePencil):
+        return 'strokes'
+    if isinstance(data, bpy.types.Mesh):
+        return 'polygons'
+    if isinstance(data, bpy.types.TextCurve):
+        return 'characters'
+    return 'splines'
+
+
+def iter_index_arrays(data):
+    '''Yield (collection, material_index array) for every element holding a material index in data
+    (one item per frame for grease pencil, so reading can be spread over multiple steps)
+    '''
+    if isinstance(data, bpy.types.GreasePencil):
+        return _gp_index_arrays(data)
+    if isinstance(data, bpy.types.Mesh):
+        return iter(_mesh_index_arrays(data))
+    if isinstance(data, bpy.types.Curve):
+        return iter(_curve_index_arrays(data))
+    raise TypeError(f'Material slots compaction not supported for {type(data).__name__}')
+
+
+def index_arrays_count(data):
+    '''Number of items yielded by iter_index_arrays'''
+    if isinstance(data, bpy.types.GreasePencil):
+        return sum(len(layer.frames) for layer in data.layers)
+    return 1
+
+
+def get_index_arrays(data):
+    '''Return list of (collection, material_index array) for every element holding a material index in data'''
+    return list(iter_index_arrays(data))
+
+
+def compact_data_slots(data, fuse=True, remove_empty=False):
+    '''Fuse duplicated slots and/or remove empty slots of data materials in one step
+    Slots must be linked to data (see has_object_linked_slots) and data not in edit mode
+    Return number of removed slots
+    '''
+    materials = list(data.materials)
+    kept, lut = build_slot_lut(materials, fuse=fuse, remove_empty=remove_empty)
+    if len(kept) == len(materials):
+        return 0
+    with profiling.current.stage('index_reading'):
+        index_arrays = get_index_arrays(data)
+    return apply_slot_lut(data, kept, lut, index_arrays)
+
+
+def apply_slot_lut(data, kept, lut, index_arrays):
+    '''Rebuild data material list with kept materials and remap material indices with lut (see build_slot_lut)
+    :index_arrays: (collection, material_index array) read before any change (see iter_index_arrays)
+    Return number of removed slots
+    '''
+    removed = len(data.materials) - len(kept)
+    prof = profiling.current
+    with prof.stage('slot_compaction'):
+        last = len(data.materials) - 1
+        data.materials.clear()
+        for mat in kept:
+            data.materials.append(mat)
+
+        rewritten = 0
+        for collection, indices in index_arrays:
+            if not len(indices):
+                continue
+            # out of range indices behave like last slot
+            collection.foreach_set('material_index', lut[np.clip(indices, 0, max(last, 0))])
+            rewritten += len(indices)
+
+        data.update_tag()
+
+    prof.count('slots_removed', removed)
+    prof.count(f'{rewritten_label(data)}_rewritten', rewritten)
+    return removed
+
+
+def has_object_linked_slots(ob):
+    '''Slots linked to object store material on object, data materials compaction would break them'''
+    return any(ms.link == 'OBJECT' for ms in ob.material_slots)
+
+
+def compact_object_slots(ob, fuse=True, remove_empty=False):
+    '''Compact material slots of object data (affect all objects sharing this data)
+    Return number of removed slots, None if data is linked from a library
+    or an object using the data has object-linked slots (not supported)
+    '''
+    if ob.data.library is not None:
+        return
+    if any(has_object_linked_slots(o) for o in bpy.data.objects if o.data == ob.data):
+        return
+    return compact_data_slots(ob.data, fuse=fuse, remove_empty=remove_empty)
+
+
+
+def supported_data_types():
+    return (bpy.types.Mesh, bpy.types.Curve, bpy.types.GreasePencil)
+
+
+def compact_objects_slots(objects, fuse=True, remove_empty=False):
+    '''Compact material slots of every passed objects, each data is processed once even if shared
+    Objects with unsupported data, in edit mode, using object-linked slots or with data linked from a library are skipped
+    Return (number of removed slots, list of skipped objects)
+    '''
+    types = supported_data_types()
+    datas = {} # data pointer -> (data, objects)
+    skipped = []
+    for ob in objects:
+        data = ob.data
+        if data is None or not isinstance(data, types):
+            continue
+        if ob.mode == 'EDIT' or data.library is not None:
+            skipped.append(ob)
+            continue
+        datas.setdefault(data.as_pointer(), (data, []))[1].append(ob)
+
+    if not datas:
+        return 0, skipped
+
+    # objects outside of passed list can share the data too
+    linked_data = set()
+    for ob in bpy.data.objects:
+        if ob.data is not None and has_object_linked_slots(ob):
+            linked_data.add(ob.data.as_pointer())
+
+    removed = 0
+    for key, (data, users) in datas.items():
+        if key in linked_data:
+            skipped += users
+            continue
+        removed += compact_data_slots(data, fuse=fuse, remove_empty=remove_empty)
+    return removed, skipped
+
+
+def remove_empty_slots(objects):
+    '''Remove empty material slots of passed objects (mesh, curve, text, surface, grease pencil)
+    Elements assigned to a removed slot go to previous slot, as with material_slot_remove
+    Return (number of removed slots, list of skipped objects)
+    '''
+    return compact_objects_slots(objects, fuse=False, remove_empty=True)
@@ -0,0 +1,120 @@
+'''Run long operator jobs in time slices, with progress, Esc to cancel and a single undo step
+
+A job is a generator:
+- its compute phase only reads blend data and yields progress tuples (done, total, text) between chunks
+- after its last yield it applies every change at once (in one tick) and returns
+  an info tuple (report type, message) or None
+
+Cancelling closes the generator before the apply phase, so nothing is changed.
+Operators using ModalJob need "UNDO" in bl_options: the undo step is pushed when the job finishes.
+'''
+
+import time
+
+import bpy
+
+from . import profiling
+
+
+def run_to_end(job):
+    '''Consume job generator synchronously, return its result'''
+    while True:
+        try:
+            next(job)
+        except StopIteration as stop:
+            return stop.value
+
+
+class ModalJob:
+    '''Operator mixin: call `return self.run_job(context)` in execute and implement job(context)
+
+    Run modal in the UI, synchronously in background mode, from redo panel or without window.
+    '''
+
+    # max seconds of job work per timer tick (UI redraws between ticks)
+    tick_budget = 0.05
+    tick_interval = 0.01
+
+    def job(self, context):
+        '''Return job generator (context is only valid in execute: read what the job needs from it here, not in generator body)'''
+        raise NotImplementedError
+
+    def job_finished(self, context, result):
+        '''Report job result, return operator result'''
+        if result:
+            self.report({result[0]}, result[1])
+        return {'FINISHED'}
+
+    def run_job(self, context):
+        self._profile = profiling.profile_operator(self.bl_label)
+        self._profile.__enter__()
+        try:
+            # job() read context and can fail (bad color database...), profiling must end anyway
+            self._job = self.job(context)
+        except BaseException:
+            self._profile.__exit__(None, None, None)
+            raise
+
+        if bpy.app.background or context.window is None or self.is_repeat():
+            try:
+                result = run_to_end(self._job)
+            finally:
+                self._profile.__exit__(None, None, None)
+            return self.job_finished(context, result)
+
+        wm = context.window_manager
+        self._progress = None # (text, total) of current progress bar
+        self._timer = None
+        try:
+            self._timer = wm.event_timer_add(self.tick_interval, window=context.window)
+            wm.modal_handler_add(self)
+            context.workspace.status_text_set(f'{self.bl_label}... (Esc to cancel)')
+        except BaseException:
+            self._job.close()
+            self._end(context)
+            raise
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self._job.close()
+            self._end(context)
+            self.report({'WARNING'}, f'{self.bl_label} cancelled, nothing changed')
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER' or event.timer is not self._timer:
+            # data must not change while the job is computing
+            return {'RUNNING_MODAL'}
+
+        start = time.perf_counter()
+        try:
+            while time.perf_counter() - start < self.tick_budget:
+                progress = next(self._job)
+                if progress:
+                    self._show_progress(context, *progress)
+        except StopIteration as stop:
+            self._end(context)
+            return self.job_finished(context, stop.value)
+        except Exception:
+            self._end(context)
+            raise
+        return {'RUNNING_MODAL'}
+
+    def _show_progress(self, context, done, total, text):
+        wm = context.window_manager
+        if self._progress != (text, total):
+            if self._progress is not None:
+                wm.progress_end()
+            wm.progress_begin(0, max(total, 1))
+            self._progress = (text, total)
+        wm.progress_update(done)
+        context.workspace.status_text_set(f'{self.bl_label}: {text} {done}/{total} (Esc to cancel)')
+
+    def _end(self, context):
+        wm = context.window_manager
+        if self._timer is not None:
+            wm.event_timer_remove(self._timer)
+        if self._progress is not None:
+            wm.progress_end()
+        context.workspace.status_text_set(None)
+        self._profile.__exit__(None, None, None)
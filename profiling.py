@@ -0,0 +1,151 @@
+'''Lightweight instrumentation of addon hot paths
+
+Code being measured use the module level `current` profiler:
+    with profiling.current.stage('node_traversal'):
+        ...
+    profiling.current.count('nodes_visited', n)
+
+When profiling is disabled (default), `current` is a null profiler
+whose methods do nothing, so instrumentation cost is a method call.
+Operators wrap their execution with `profile_operator` which activate
+a real profiler if enabled in addon preferences and output the report.
+'''
+
+import time
+
+
+class _Stage:
+    __slots__ = ('totals', 'name', 'start')
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        total = self.totals.get(self.name)
+        if total is None:
+            self.totals[self.name] = [elapsed, 1]
+        else:
+            total[0] += elapsed
+            total[1] += 1
+
+
+class Profiler:
+    '''Accumulate stage timings (inclusive, stages can be nested) and counters'''
+
+    enabled = True
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {} # stage name -> [seconds, calls]
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def stage(self, name):
+        return _Stage(self.stages, name)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            'operation': self.name,
+            'seconds': self.elapsed,
+            'stages': {k: {'seconds': v[0], 'calls': v[1]} for k, v in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        lines = [f'Auto material profile - {self.name}: {self.elapsed or 0:.4f}s']
+        if self.stages:
+            lines.append('  stages (inclusive):')
+            for name, (seconds, calls) in sorted(self.stages.items(), key=lambda x: -x[1][0]):
+                lines.append(f'    {name:<24} {seconds:>9.4f}s  ({calls} calls)')
+        if self.counters:
+            lines.append('  counters:')
+            for name, value in self.counters.items():
+                lines.append(f'    {name:<24} {value:>10}')
+        return '\n'.join(lines)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullProfiler:
+    '''Do nothing profiler used when profiling is disabled'''
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, value=1):
+        pass
+
+
+NULL = NullProfiler()
+current = NULL
+
+
+# Report outputs, (identifier, name, description) as used by AM_preferences enum
+outputs = (
+    ('CONSOLE', 'Console', 'Print report in console'),
+    ('TEXT', 'Text Datablock', 'Print report in console and write it in a text datablock'),
+    ('JSON', 'JSON File', 'Print report in console and write it as JSON in a file'),
+)
+
+TEXT_NAME = 'auto_material_profile'
+
+
+def write_report(profiler, output='CONSOLE', json_path=''):
+    print(profiler.report())
+    if output == 'TEXT':
+        import bpy
+        text = bpy.data.texts.get(TEXT_NAME) or bpy.data.texts.new(TEXT_NAME)
+        text.write(profiler.report() + '\n\n')
+    elif output == 'JSON' and json_path:
+        import bpy
+        import json
+        with open(bpy.path.abspath(json_path), 'w') as fd:
+            json.dump(profiler.as_dict(), fd, indent=2)
+
+
+class profile_operator:
+    '''Context manager activating profiling for an operator execution (if enabled in addon preferences)'''
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        global current
+        from .fn import get_addon_prefs
+        self.prefs = get_addon_prefs()
+        if self.prefs.use_profiling and not current.enabled:
+            self.profiler = current = Profiler(self.name)
+        return current
+
+    def __exit__(self, *exc):
+        global current
+        if self.profiler is None:
+            return
+        current = NULL
+        self.profiler.stop()
+        write_report(self.profiler, self.prefs.profile_output, self.prefs.profile_json_path)
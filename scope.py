@@ -0,0 +1,126 @@
+'''Resolve objects and materials affected by an operation
+
+Every operator resolve its targets here, so they all understand the same scopes.
+Results are deduplicated with ordered sets keyed by datablock pointer
+(no `x not in list` search), in linear time of the number of slots scanned.
+'''
+
+import bpy
+
+# Scopes, (identifier, name, description) as used by operators and scene enums
+scopes = (
+    ('ACTIVE', 'Active', 'Active object'),
+    ('SELECTED', 'Selected', 'Active and selected objects'),
+    ('COLLECTION', 'Collection', 'Objects of active collection and its children (instanced collections included)'),
+    ('SCENE', 'Scene', 'All objects in scene (instanced collections included)'),
+    ('FILE', 'Whole File', 'All objects and materials in file (including data not used in scene)'),
+)
+
+# previous identifiers still accepted
+_aliases = {'ALL': 'SCENE'}
+
+def enum_items():
+    return [(*s, i) for i, s in enumerate(scopes)]
+
+
+class PointerSet:
+    '''Ordered set of blender structs keyed by pointer (hashing by pointer is cheaper than by struct)'''
+
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        self._items = {}
+        self.update(items)
+
+    def add(self, item):
+        if item is not None:
+            self._items.setdefault(item.as_pointer(), item)
+
+    def update(self, items):
+        setdefault = self._items.setdefault
+        for item in items:
+            if item is not None:
+                setdefault(item.as_pointer(), item)
+
+    def __contains__(self, item):
+        return item is not None and item.as_pointer() in self._items
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def list(self):
+        return list(self._items.values())
+
+
+def is_linked(id):
+    '''Return True if datablock comes from a library (changes would not be saved)'''
+    return id is not None and id.library is not None
+
+
+def slot_editable(ob, slot):
+    '''Return True if material of slot can be changed (owner of the slot is local)
+    Objects of instanced collections are usually linked from a library
+    '''
+    return not is_linked(ob if slot.link == 'OBJECT' else ob.data)
+
+
+def collection_objects(collection, objects=None, visited=None):
+    '''Return PointerSet of objects in collection, children collections and instanced collections (recursively)'''
+    objects = PointerSet() if objects is None else objects
+    visited = set() if visited is None else visited
+    stack = [collection]
+    while stack:
+        col = stack.pop()
+        key = col.as_pointer()
+        if key in visited:
+            continue
+        visited.add(key)
+        for ob in col.all_objects:
+            objects.add(ob)
+            if ob.instance_type == 'COLLECTION' and ob.instance_collection:
+                stack.append(ob.instance_collection)
+    return objects
+
+
+def get_objects(scope='ACTIVE', context=None):
+    '''Return list of unique objects for scope in ('ACTIVE', 'SELECTED', 'COLLECTION', 'SCENE', 'FILE')'''
+    context = context or bpy.context
+    scope = _aliases.get(scope, scope)
+    if scope == 'ACTIVE':
+        return [context.object] if context.object else []
+    if scope == 'SELECTED':
+        objects = PointerSet((context.object,))
+        objects.update(context.selected_objects)
+        return objects.list()
+    if scope == 'COLLECTION':
+        return collection_objects(context.collection).list()
+    if scope == 'SCENE':
+        return collection_objects(context.scene.collection).list()
+    if scope == 'FILE':
+        return list(bpy.data.objects)
+    return []
+
+
+def get_materials(scope='SELECTED', all_slots=True, context=None, filter=None):
+    '''Return list of unique materials used by objects of scope
+    :all_slots: materials of every slot, else only active material of each object
+    :filter: optional function, material is kept if it return True
+    'FILE' scope return all materials of the file (used or not) when all_slots is True
+    '''
+    scope = _aliases.get(scope, scope)
+    if scope == 'FILE' and all_slots:
+        materials = bpy.data.materials
+    else:
+        materials = PointerSet()
+        for ob in get_objects(scope, context=context):
+            if all_slots:
+                materials.update(slot.material for slot in ob.material_slots)
+            else:
+                materials.add(ob.active_material)
+
+    if filter is None:
+        return list(materials)
+    return [m for m in materials if filter(m)]
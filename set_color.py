@@ -1,4 +1,5 @@
 from . import fn
+from . import profiling
 import bpy
  
 class AM_OT_viewport_color_from_node(bpy.types.Operator):
@@ -13,15 +14,36 @@ class AM_OT_viewport_color_from_node(bpy.types.Operator):
         return True
  
     def execute(self, context):
-        if self.from_viewport:
-            fn.match_color_node_from_viewport(variables={'self':self, 'context':context})
-        else:
-            fn.match_color_viewport_from_node(variables={'self':self, 'context':context})
+        with profiling.profile_operator(self.bl_label):
+            if self.from_viewport:
+                fn.match_color_node_from_viewport(variables={'self':self, 'context':context})
+            else:
+                fn.match_color_viewport_from_node(variables={'self':self, 'context':context})
         return {"FINISHED"}
 
+class AM_OT_clear_texture_cache(bpy.types.Operator):
+    bl_idname = "materials.clear_texture_cache"
+    bl_label = "Clear texture color cache"
+    bl_description = "Forget texture colors sampled in previous sessions (delete cache file)"
+    bl_options = {"REGISTER", "INTERNAL"}
+
+    def execute(self, context):
+        cache = fn.get_texture_cache()
+        ct = len(cache)
+        cache.clear()
+        self.report({'INFO'}, f'{ct} cached texture colors removed')
+        return {"FINISHED"}
+
+classes = (
+    AM_OT_viewport_color_from_node,
+    AM_OT_clear_texture_cache,
+)
+
 def register():
-    bpy.utils.register_class(AM_OT_viewport_color_from_node)
+    for cls in classes:
+        bpy.utils.register_class(cls)
  
 def unregister():
-    bpy.utils.unregister_class(AM_OT_viewport_color_from_node)
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
 
@@ -0,0 +1,145 @@
+'''Track materials edited since the last pass of incremental operations
+
+A depsgraph_update_post handler marks updated materials dirty in every subscribed channel.
+Each feature using it (incremental naming, live viewport color sync) has its own channel,
+so they consume changes independently, and a per-material cache to keep last results.
+Handlers are only installed while at least one channel is subscribed.
+'''
+
+from itertools import islice
+
+import bpy
+from bpy.app.handlers import persistent
+
+
+class Channel:
+    '''Dirty materials (keyed by pointer) of one consumer
+
+    full: every material must be considered dirty (a shader node group changed)
+    cache: consumer results per material, cleared when pointers can't be trusted anymore (file load, undo)
+    callback: optional function called after materials are marked dirty
+    '''
+
+    __slots__ = ('dirty', 'full', 'cache', 'callback')
+
+    def __init__(self, callback=None):
+        self.dirty = {}
+        self.full = False
+        self.cache = {}
+        self.callback = callback
+
+    def mark(self, mat):
+        self.dirty[mat.as_pointer()] = mat
+
+    def discard(self, mat):
+        self.dirty.pop(mat.as_pointer(), None)
+
+    def reset(self):
+        self.dirty.clear()
+        self.cache.clear()
+
+    def invalidate_all(self):
+        self.reset()
+        self.full = True
+
+    def pop(self, count=None):
+        '''Remove and return up to count dirty materials (still valid ones)'''
+        materials = []
+        # only copy the keys popped (draining one by one must stay linear)
+        for key in list(islice(self.dirty, count)):
+            mat = self.dirty.pop(key)
+            try:
+                mat.name
+            except ReferenceError: # removed since marked
+                continue
+            materials.append(mat)
+        return materials
+
+
+channels = {}
+
+
+def _image_users(img):
+    '''Return materials using image in their nodes and True if a shader node group use it'''
+    users = bpy.data.user_map(subset={img}, value_types={'MATERIAL', 'NODETREE'}).get(img, ())
+    materials = [u for u in users if isinstance(u, bpy.types.Material)]
+    in_group = any(isinstance(u, bpy.types.NodeTree) and u.bl_idname == 'ShaderNodeTree' for u in users)
+    return materials, in_group
+
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    materials = []
+    invalidate = False
+    for update in depsgraph.updates:
+        id = update.id
+        if isinstance(id, bpy.types.Material):
+            materials.append(id.original)
+        elif isinstance(id, bpy.types.NodeTree):
+            # shader node group, can be used by any number of materials
+            # (geometry nodes, compositor... trees don't change material colors)
+            if id.bl_idname == 'ShaderNodeTree' and not id.is_embedded_data:
+                invalidate = True
+        elif isinstance(id, bpy.types.Image) and id.type == 'IMAGE':
+            # texture edit (viewer and render results are ignored), only materials using it are affected
+            users, in_group = _image_users(id.original)
+            materials += users
+            invalidate = invalidate or in_group
+
+    if not materials and not invalidate:
+        return
+
+    for channel in channels.values():
+        if invalidate:
+            channel.invalidate_all()
+        else:
+            for mat in materials:
+                channel.mark(mat)
+        if channel.callback:
+            channel.callback()
+
+
+@persistent
+def _on_reset(*args):
+    '''Stored materials and pointers are invalid after file load and undo'''
+    for channel in channels.values():
+        channel.reset()
+
+
+_handlers = (
+    (bpy.app.handlers.depsgraph_update_post, _on_depsgraph_update),
+    (bpy.app.handlers.load_post, _on_reset),
+    (bpy.app.handlers.undo_post, _on_reset),
+    (bpy.app.handlers.redo_post, _on_reset),
+)
+
+
+def subscribe(name, callback=None):
+    '''Create channel (if needed) and install handlers, return channel'''
+    channel = channels.get(name)
+    if channel is None:
+        channel = channels[name] = Channel(callback)
+    if not any(_on_depsgraph_update is h for h in bpy.app.handlers.depsgraph_update_post):
+        for handlers, func in _handlers:
+            handlers.append(func)
+    return channel
+
+
+def unsubscribe(name):
+    '''Remove channel, remove handlers if it was the last one'''
+    channels.pop(name, None)
+    if channels:
+        return
+    for handlers, func in _handlers:
+        if func in handlers:
+            handlers.remove(func)
+
+
+def get(name):
+    '''Return subscribed channel or None'''
+    return channels.get(name)
+
+
+def unregister():
+    for name in list(channels):
+        unsubscribe(name)
@@ -14,6 +14,7 @@ def Material_handle_Panel(self, context):
     split = layout.split(factor=0.25, align=False)
     split.label(text='Auto Name:')
     split.prop(context.scene, "mat_change_multiple", text='Rename All Slots')
+    split.prop(context.scene, "mat_scope", text='')
     col = layout.column(align=True)
     row = col.row(align=True)
     row.operator('materials.auto_name_material', text = "Rename From Viewport", icon='RESTRICT_COLOR_ON').viewport = True
@@ -29,6 +30,7 @@ def GP_Material_handle_Panel(self, context):
     split = layout.split(factor=0.25, align=False)
     split.label(text='Auto Name:')
     split.prop(context.scene, "mat_change_multiple", text='Rename All Slots')
+    split.prop(context.scene, "mat_scope", text='')
     layout.operator('materials.auto_name_material', text = "Rename From Color", icon='RESTRICT_COLOR_ON').viewport = True
 
 def register():